@@ -0,0 +1,185 @@
+"""Applies the same edits to the custom shapes of every level in a folder without opening the editor, for example:
+    python batch_edit.py "Poly Bridge 2/Sandbox" --color 255 0 0 --recolor 0 0 255
+Levels are edited in parallel on a pool of processes, each one loaded through the same objects that the editor uses
+and saved through the converter. Edits are applied in the order strip, scale, translate, recolor."""
+import os
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
+
+import re
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import *
+
+import layout_objects as lay
+from converter import PolyConverter, SUCCESS_CODE
+from layout_io import read_layout, write_layout, snapshot_layout
+from level_catalog import LevelInfo, list_levels
+from spatial_index import Bounds, overlaps
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class ShapeFilter:
+	"""Which custom shapes are edited: all of them, or only those with a color or inside a rectangle"""
+
+	def __init__(self, color: Sequence[int] = None, within: Bounds = None):
+		self.color = tuple(color) if color else None
+		self.within = tuple(within) if within else None
+
+	def __call__(self, shape: lay.CustomShape) -> bool:
+		if self.color is not None and tuple(shape.color[:3]) != self.color:
+			return False
+		if self.within is not None and not overlaps(shape.world_bounds, self.within):
+			return False
+		return True
+
+
+class Edits:
+	"""The edits to apply to each level. None means an edit isn't made."""
+
+	def __init__(self, shape_filter: ShapeFilter, strip=False, scale: Sequence[float] = None,
+	             translate: Sequence[float] = None, recolor: Sequence[int] = None):
+		self.shape_filter = shape_filter
+		self.strip = strip
+		self.scale = tuple(scale) if scale else None
+		self.translate = tuple(translate) if translate else None
+		self.recolor = tuple(recolor) if recolor else None
+
+	def apply(self, layout: dict) -> Tuple[int, int]:
+		"""Edits a layout, returning how many shapes were changed by the edits and how many dangling references
+		were removed"""
+		stripped = strip_dangling_references(layout) if self.strip else 0
+		edited = 0
+		for shape in lay.LayoutList(lay.CustomShape, layout):
+			if not self.shape_filter(shape):
+				continue
+			before = snapshot_layout(shape.dictionary)
+			if self.scale is not None:
+				shape.scale = shape.scale * (*self.scale, 1)
+			if self.translate is not None:
+				shape.pos += self.translate
+			if self.recolor is not None:
+				shape.color = self.recolor
+			if shape.dictionary != before:
+				edited += 1
+		return edited, stripped
+
+
+def strip_dangling_references(layout: dict) -> int:
+	"""Removes what refers to objects that don't exist: dynamic anchors of custom shapes that aren't anchors,
+	and bridge edges whose joints aren't there. Neither has any effect on the level. Returns how many were removed."""
+	anchor_ids = {anchor["m_Guid"] for anchor in layout[lay.Anchor.list_name]}
+	removed = 0
+	for shape in layout[lay.CustomShape.list_name]:
+		ids = shape["m_DynamicAnchorGuids"]
+		kept = [i for i in ids if i in anchor_ids]
+		removed += len(ids) - len(kept)
+		shape["m_DynamicAnchorGuids"] = kept
+	bridge = layout["m_Bridge"]
+	joint_ids = anchor_ids | {joint["m_Guid"] for joint in bridge["m_BridgeJoints"]}
+	edges = bridge["m_BridgeEdges"]
+	kept = [e for e in edges if e["m_NodeA_Guid"] in joint_ids and e["m_NodeB_Guid"] in joint_ids]
+	removed += len(edges) - len(kept)
+	bridge["m_BridgeEdges"] = kept
+	return removed
+
+
+def edit_level(folder: str, info: LevelInfo, edits: Edits, converter: Optional[str], dry_run: bool
+               ) -> Tuple[str, int, int, int, Optional[str]]:
+	"""Edits one level and saves it. Returns its name, the shapes edited, the references removed,
+	the size of the JSON in bytes and an error message if it failed. This runs in the worker processes."""
+	jsonfile, layoutfile = os.path.join(folder, info.jsonfile), os.path.join(folder, info.layoutfile)
+	polyconverter = PolyConverter(converter) if converter else None
+	try:
+		if info.stale:
+			if polyconverter is None:
+				return info.name, 0, 0, 0, f"{info.layoutfile} is newer than its json, and there is no converter"
+			program = polyconverter.convert(layoutfile)
+			if program.returncode != SUCCESS_CODE:
+				return info.name, 0, 0, 0, program.stdout.decode().strip() or program.stderr.decode().strip()
+		layout = read_layout(jsonfile)
+		layout["m_Bridge"]["m_Anchors"] = layout["m_Anchors"]  # both should update together, like in the editor
+		edited, stripped = edits.apply(layout)
+		if not dry_run and (edited or stripped):
+			write_layout(layout, jsonfile)
+			if polyconverter is not None:
+				program = polyconverter.convert(jsonfile)
+				if program.returncode != SUCCESS_CODE:
+					return info.name, edited, stripped, 0, \
+					       program.stdout.decode().strip() or program.stderr.decode().strip()
+		return info.name, edited, stripped, os.path.getsize(jsonfile), None
+	except Exception as error:
+		return info.name, 0, 0, 0, f"{type(error).__name__}: {error}"
+
+
+def parse_args(args: Sequence[str] = None) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("folder", help="folder with the levels to edit")
+	parser.add_argument("--levels", metavar="REGEX", help="only edit levels whose name matches")
+	parser.add_argument("--color", type=int, nargs=3, metavar=("R", "G", "B"),
+	                    help="only edit shapes with this color, from 0 to 255")
+	parser.add_argument("--within", type=float, nargs=4, metavar=("LEFT", "BOTTOM", "RIGHT", "TOP"),
+	                    help="only edit shapes that touch this rectangle in world space")
+	parser.add_argument("--strip", action="store_true",
+	                    help="remove dynamic anchors and bridge edges that refer to objects that don't exist")
+	parser.add_argument("--scale", type=float, nargs=2, metavar=("X", "Y"), help="multiply the scale of shapes")
+	parser.add_argument("--translate", type=float, nargs=2, metavar=("X", "Y"), help="move shapes")
+	parser.add_argument("--recolor", type=int, nargs=3, metavar=("R", "G", "B"), help="change the color of shapes")
+	parser.add_argument("--converter", default="PolyConverter.exe",
+	                    help="converter used to read and save .layout files (default: %(default)s)")
+	parser.add_argument("--no-convert", action="store_true", help="only edit the .layout.json files")
+	parser.add_argument("--dry-run", action="store_true", help="count what would change without saving")
+	parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processes to use (default: %(default)s)")
+	return parser.parse_args(args)
+
+
+def main(args: Sequence[str] = None):
+	args = parse_args(args)
+	edits = Edits(ShapeFilter(args.color, args.within), args.strip, args.scale, args.translate, args.recolor)
+	if not (edits.strip or edits.scale or edits.translate or edits.recolor):
+		sys.exit("Nothing to do: use --strip, --scale, --translate or --recolor")
+	folder = os.path.abspath(args.folder)
+	levels = list_levels(folder)
+	if args.levels:
+		levels = [info for info in levels if re.search(args.levels, info.name)]
+	converter = None if args.no_convert else args.converter
+
+	start = perf_counter()
+	edited_levels = failed_levels = skipped_levels = total_shapes = total_stripped = total_bytes = 0
+	if args.dry_run:  # converting a stale level would write its .layout.json
+		for info in [info for info in levels if info.stale]:
+			skipped_levels += 1
+			print(f"{info.name}: skipped, {info.layoutfile} is newer than its json and isn't converted in a dry run")
+		levels = [info for info in levels if not info.stale]
+	with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+		futures = [executor.submit(edit_level, folder, info, edits, converter, args.dry_run) for info in levels]
+		for future in as_completed(futures):
+			name, edited, stripped, size, error = future.result()
+			if error is not None:
+				failed_levels += 1
+				print(f"{name}: failed, {error}")
+				continue
+			if edited or stripped:
+				edited_levels += 1
+				print(f"{name}: {edited} shapes edited, {stripped} references removed")
+			total_shapes += edited
+			total_stripped += stripped
+			total_bytes += size
+	seconds = perf_counter() - start
+
+	print(f"\n{len(levels)} levels in {seconds:.2f}s ({len(levels) / seconds:.1f} levels/s, "
+	      f"{total_bytes / 1024 ** 2 / seconds:.1f}MB/s) with {args.workers} workers"
+	      + (", dry run" if args.dry_run else ""))
+	print(f"{edited_levels} levels changed, {failed_levels} failed, "
+	      + (f"{skipped_levels} skipped, " if skipped_levels else "")
+	      + f"{total_shapes} shapes edited, {total_stripped} references removed")
+	if failed_levels:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	multiprocessing.freeze_support()
+	main()
@@ -0,0 +1,168 @@
+"""Microbenchmarks for the math objects, the collision backends and saving, run with `python benchmark.py`.
+Each case times the same operation as it is used in the editor, once per implementation."""
+import os
+import json
+import math
+import re
+import timeit
+import tracemalloc
+import pygame
+from tempfile import mkstemp
+from typing import *
+
+import layout_objects as lay
+from layout_io import write_layout
+from math_objects import Vector, Vec2, Vec3
+
+REPEAT = 5
+NUMBER = 20000
+
+
+def vector_cases(cls2: Callable, cls3: Callable) -> Dict[str, Callable[[], Any]]:
+	"""The operations that layout_objects performs per object or per point, built with the given vector types"""
+	pos = cls3(12.5, -3.25, 0.0)
+	point = cls2(1.5, 2.5)
+	camera = cls2(30.0, -20.0)
+	line_start, line_end = cls2(0.0, 0.0), cls2(10.0, 4.0)
+	zoom = 20
+	pos_dict = {"x": 12.5, "y": -3.25, "z": 0.0}
+	return {
+		"from dict": lambda: cls3.from_dict(pos_dict),
+		"attribute access": lambda: (pos.x, pos.y, pos.z),
+		"add tuple": lambda: pos + (1, -1),
+		"screen transform": lambda: (zoom * (point + camera).flip_y()).round(),
+		"scale and flip": lambda: (point * (1.5, 0.5)).flip_x(),
+		"rotate": lambda: point.rotate(37.0, camera),
+		"flip": lambda: point.flip(camera, 37.0),
+		"to dict": lambda: pos.to_dict(),
+		"closest point": lambda: point.closest_point(line_start, line_end),
+	}
+
+
+def collision_cases(backend: str) -> Dict[str, Callable[[], Any]]:
+	"""Collision checks against a large concave shape, using the given hitbox backend"""
+	# A star with 24 points, 20 units across
+	points = [{"x": (10 if i % 2 else 4) * math.cos(i * math.pi / 12),
+	           "y": (10 if i % 2 else 4) * math.sin(i * math.pi / 12)} for i in range(24)]
+	shape = lay.CustomShape({
+		"m_Pos": {"x": 0.0, "y": 0.0, "z": 0.0}, "m_Rot": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0},
+		"m_Scale": {"x": 1.0, "y": 1.0, "z": 1.0}, "m_Flipped": False, "m_RotationDegrees": 0.0,
+		"m_PointsLocalSpace": points, "m_StaticPins": [], "m_DynamicAnchorGuids": [],
+		"m_Color": {"r": 1.0, "g": 1.0, "b": 1.0, "a": 1.0},
+	})
+	zoom, camera = 20, Vector(20, -20)
+	shape.render(pygame.Surface((800, 800)), camera, zoom, lay.ShapeRenderArgs(False, False, False, Vector(), Vector()))
+
+	def with_backend(func: Callable[[], Any]) -> Callable[[], Any]:
+		def case():
+			lay.HITBOX_BACKEND = backend
+			return func()
+		return case
+
+	rect = (380, 380, 40, 40)
+	mask = lay.rect_hitbox_mask(rect, zoom) if backend == lay.HITBOX_MASK else None
+	return {
+		"point inside": with_backend(lambda: shape.collidepoint((400, 400))),
+		"point outside": with_backend(lambda: shape.collidepoint((400 + 9 * zoom, 400 + 9 * zoom))),
+		"rect overlap": with_backend(lambda: shape.colliderect(rect, mask)),
+		"calculate hitbox": with_backend(lambda: shape.calculate_hitbox()),
+	}
+
+
+def make_layout(shape_count: int, edge_count: int) -> dict:
+	"""A layout with the given number of custom shapes and bridge edges, with everything else kept small"""
+	def pos(i: int) -> dict:
+		return {"x": i * 0.37 % 50, "y": i * 0.11 % 20, "z": 0.0}
+
+	shapes = [{
+		"m_Pos": pos(i), "m_Rot": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0}, "m_Scale": {"x": 1.0, "y": 1.0, "z": 1.0},
+		"m_Dynamic": False, "m_Bounciness": 0.5, "m_RotationDegrees": 0.0, "m_Flipped": False,
+		"m_Color": {"r": 0.5, "g": 0.25, "b": 0.125, "a": 1.0}, "m_CollisionLayer": 0, "m_GroupIdx": 0,
+		"m_PointsLocalSpace": [pos(i + j) for j in range(6)], "m_StaticPins": [pos(i)], "m_DynamicAnchorGuids": [],
+	} for i in range(shape_count)]
+	joints = [{"m_Pos": pos(i), "m_IsAnchor": False, "m_IsSplit": False, "m_Guid": f"joint-{i}"}
+	          for i in range(edge_count // 2 + 1)]
+	edges = [{"m_Material": i % 9 + 1, "m_NodeA_Guid": f"joint-{i // 2}", "m_NodeB_Guid": f"joint-{i // 2 + 1}",
+	          "m_JointAPart": 2, "m_JointBPart": 2, "m_Guid": f"edge-{i}"} for i in range(edge_count)]
+	return {
+		"m_Version": 26, "m_ThemeStubKey": "PineMountains", "m_Anchors": [], "m_CustomShapes": shapes,
+		"m_Bridge": {"m_Version": 8, "m_BridgeJoints": joints, "m_BridgeEdges": edges, "m_Anchors": []},
+	}
+
+
+def save_with_regex(layout: dict, path: str):
+	"""How layouts used to be saved: indented by json.dumps, then joined back into one line per object"""
+	jsonstr = json.dumps(layout, indent=2)
+	jsonstr = re.sub(r"(\r\n|\r|\n)( ){6,}", r" ", jsonstr)
+	jsonstr = re.sub(r"(\r\n|\r|\n)( ){4,}([}\]])", r" \3", jsonstr)
+	with open(path, "w") as openfile:
+		openfile.write(jsonstr)
+
+
+def serializer_cases(save: Callable[[dict, str], Any], path: str) -> Dict[str, Callable[[], Any]]:
+	"""Saving small and large layouts to a file with the given function"""
+	small, large = make_layout(100, 500), make_layout(5000, 40000)
+	return {
+		"save small layout": lambda: save(small, path),
+		"save large layout": lambda: save(large, path),
+	}
+
+
+def peak_memory(func: Callable[[], Any]) -> float:
+	"""The most memory allocated while running a function, in megabytes"""
+	tracemalloc.start()
+	func()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak / 1024 ** 2
+
+
+def run(cases: Dict[str, Dict[str, Callable[[], Any]]], number=NUMBER) -> Dict[str, Dict[str, float]]:
+	"""Times every case of every group, returning the best time per call in microseconds"""
+	results = {}
+	for group, group_cases in cases.items():
+		for name, func in group_cases.items():
+			best = min(timeit.repeat(func, repeat=REPEAT, number=number))
+			results.setdefault(name, {})[group] = best / number * 1e6
+	return results
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: str):
+	groups = list(next(iter(results.values())).keys())
+	print(f"{'operation':<20}" + "".join(f"{g:>14}" for g in groups) + f"{'speedup':>10}")
+	for name, times in results.items():
+		row = "".join(f"{times[g]:>12.3f}us" for g in groups)
+		speedup = times[baseline] / min(t for g, t in times.items() if g != baseline)
+		print(f"{name:<20}{row}{speedup:>9.1f}x")
+
+
+def main():
+	results = run({
+		"Vector": vector_cases(Vector, Vector),
+		"Vec2/Vec3": vector_cases(Vec2, Vec3),
+	})
+	print_results(results, "Vector")
+	print()
+	pygame.init()
+	results = run({
+		"mask": collision_cases(lay.HITBOX_MASK),
+		"analytic": collision_cases(lay.HITBOX_ANALYTIC),
+	})
+	print_results(results, "mask")
+	print()
+	handle, path = mkstemp(".layout.json")
+	try:
+		cases = {
+			"json + re": serializer_cases(save_with_regex, path),
+			"streaming": serializer_cases(write_layout, path),
+		}
+		print_results(run(cases, number=1), "json + re")
+		for group, group_cases in cases.items():
+			print(f"{group} peak memory saving the large layout: {peak_memory(group_cases['save large layout']):.1f}MB")
+	finally:
+		os.close(handle)
+		os.remove(path)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,45 @@
+"""Small files that the editor keeps between launches, in the user's local data folder"""
+import os
+import json
+from os.path import join as pathjoin, expanduser
+from typing import *
+
+CACHE_FOLDER_NAME = "PolyEditor"
+
+
+def cache_folder() -> str:
+	"""The folder where cache files are kept, which may not exist yet"""
+	base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or pathjoin(expanduser("~"), ".cache")
+	return pathjoin(base, CACHE_FOLDER_NAME)
+
+
+def cache_path(name: str) -> str:
+	return pathjoin(cache_folder(), name)
+
+
+def read_json(name: str, default: Any = None) -> Any:
+	"""Returns the contents of a cache file, or the default if it doesn't exist or can't be read"""
+	try:
+		with open(cache_path(name), "rb") as openfile:
+			return json.loads(openfile.read())
+	except (OSError, ValueError):
+		return default
+
+
+def write_json(name: str, value: Any) -> bool:
+	"""Replaces a cache file all at once, so that a crash never leaves half of it behind.
+	Returns whether it could be written: a cache that can't be saved is not an error."""
+	path = cache_path(name)
+	temp_path = f"{path}.{os.getpid()}.tmp"
+	try:
+		os.makedirs(cache_folder(), exist_ok=True)
+		with open(temp_path, "w") as openfile:
+			json.dump(value, openfile)
+		os.replace(temp_path, path)
+		return True
+	except OSError:
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+		return False
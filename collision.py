@@ -0,0 +1,93 @@
+"""Collision checks done directly on the points of polygons, as arrays of shape (N, 2) in world space.
+Polygons can be concave, and each edge goes from a point to the next one, the last edge closing the polygon."""
+import math
+import numpy as np
+from typing import *
+
+from math_objects import PointArray
+from spatial_index import Bounds
+
+Number = Union[int, float]
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+	return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _following(a: np.ndarray) -> np.ndarray:
+	"""The next item of each item, wrapping around at the end. Faster than np.roll for small arrays."""
+	return np.concatenate((a[1:], a[:1]))
+
+
+def rect_polygon(bounds: Bounds) -> PointArray:
+	"""The corners of a rectangle as a polygon"""
+	left, bottom, right, top = bounds
+	return PointArray(np.array([[left, bottom], [right, bottom], [right, top], [left, top]], dtype=np.float64))
+
+
+def point_in_polygon(point: Sequence[Number], polygon: PointArray) -> bool:
+	"""Whether a point is inside a polygon, using the even-odd rule: a ray going right from the point
+	crosses the polygon's edges an odd number of times only if the point is inside"""
+	x, y = point[0], point[1]
+	xs, ys = polygon.x, polygon.y
+	next_xs, next_ys = _following(xs), _following(ys)
+	crosses = (ys > y) != (next_ys > y)
+	xs, ys, next_xs, next_ys = xs[crosses], ys[crosses], next_xs[crosses], next_ys[crosses]
+	crossing_xs = xs + (y - ys) * (next_xs - xs) / (next_ys - ys)
+	return bool(np.count_nonzero(x < crossing_xs) % 2)
+
+
+def is_convex(polygon: PointArray) -> bool:
+	"""Whether a polygon is convex: it turns the same way at every point, and only goes around once"""
+	points = polygon.array
+	edges = _following(points) - points
+	following = _following(edges)
+	turns = _cross(edges, following)
+	if (turns > 0).any() and (turns < 0).any():
+		return False
+	angles = np.arctan2(turns, (edges * following).sum(axis=1))
+	return abs(abs(angles.sum()) - 2 * math.pi) < 1e-6
+
+
+def convex_polygons_overlap(a: PointArray, b: PointArray) -> bool:
+	"""Whether two convex polygons touch or intersect, using the separating axis theorem: they don't if their
+	projections onto the normal of some edge don't overlap. All edges are projected onto at once."""
+	edges = np.vstack([_following(p.array) - p.array for p in (a, b)])
+	axes = np.column_stack((-edges[:, 1], edges[:, 0]))
+	a_projections, b_projections = a.array @ axes.T, b.array @ axes.T
+	separated = ((a_projections.max(axis=0) < b_projections.min(axis=0))
+	             | (b_projections.max(axis=0) < a_projections.min(axis=0)))
+	return not separated.any()
+
+
+def edges_cross(a: PointArray, b: PointArray) -> bool:
+	"""Whether any edge of a polygon touches or crosses any edge of another, checking every pair at once"""
+	a_starts = a.array[:, np.newaxis, :]
+	a_ends = _following(a.array)[:, np.newaxis, :]
+	b_starts = b.array[np.newaxis, :, :]
+	b_ends = _following(b.array)[np.newaxis, :, :]
+	# Which side of each edge the ends of the other edge are on
+	a_sides = _cross(a_ends - a_starts, b_starts - a_starts) * _cross(a_ends - a_starts, b_ends - a_starts)
+	b_sides = _cross(b_ends - b_starts, a_starts - b_starts) * _cross(b_ends - b_starts, a_ends - b_starts)
+	# Edges on the same line only touch if they overlap
+	boxes_overlap = ((np.minimum(a_starts, a_ends) <= np.maximum(b_starts, b_ends))
+	                 & (np.minimum(b_starts, b_ends) <= np.maximum(a_starts, a_ends))).all(axis=2)
+	return bool(((a_sides <= 0) & (b_sides <= 0) & boxes_overlap).any())
+
+
+def polygons_overlap(a: PointArray, b: PointArray) -> bool:
+	"""Whether two polygons touch or intersect. Convex polygons use the separating axis theorem, others overlap
+	if their edges cross or if one is entirely inside the other."""
+	if is_convex(a) and is_convex(b):
+		return convex_polygons_overlap(a, b)
+	return edges_cross(a, b) or point_in_polygon(a.array[0], b) or point_in_polygon(b.array[0], a)
+
+
+def polygon_overlaps_rect(polygon: PointArray, bounds: Bounds) -> bool:
+	"""Whether a polygon touches or intersects a rectangle: some point of the polygon is in the rectangle,
+	some edges cross, or the rectangle is entirely inside the polygon"""
+	left, bottom, right, top = bounds
+	xs, ys = polygon.x, polygon.y
+	if ((xs >= left) & (xs <= right) & (ys >= bottom) & (ys <= top)).any():
+		return True
+	return edges_cross(polygon, rect_polygon(bounds)) or point_in_polygon((left, bottom), polygon)
@@ -0,0 +1,140 @@
+"""Conversion between the game's .layout files and the .layout.json files that the editor opens and saves,
+by running PolyConverter. Reading and writing .layout files needs Windows and the game."""
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from os import getcwd, listdir
+from os.path import isfile, abspath, join as pathjoin
+from subprocess import run, CompletedProcess
+from typing import *
+
+import cache_files
+from level_catalog import LevelInfo
+
+# Return codes of PolyConverter
+SUCCESS_CODE = 0
+JSON_ERROR_CODE = 1
+CONVERSION_ERROR_CODE = 2
+FILE_ERROR_CODE = 3
+GAMEPATH_ERROR_CODE = 4
+
+POLYCONVERTER_REGEX = re.compile(r"PolyConverter(.+)?\.exe$")
+CHECK_CACHE_FILE = "converter_check.json"
+PRECONVERT_WORKERS = min(4, os.cpu_count() or 1)  # converters running at the same time
+
+
+class PolyConverter:
+	"""Runs the external PolyConverter program, which uses the game's own code to read and write .layout files.
+	It converts a .layout to a .layout.json next to it, or the other way around. Results are finished programs,
+	with a return code and the messages in stdout and stderr as bytes."""
+
+	def __init__(self, executable: str):
+		self.executable = executable
+
+	def _run(self, argument: str) -> CompletedProcess:
+		# As a list, so that paths with spaces are passed as a single argument
+		return run([self.executable, argument], capture_output=True)
+
+	def convert(self, path: str) -> CompletedProcess:
+		return self._run(path)
+
+	def test(self) -> CompletedProcess:
+		return self._run("test")
+
+	def cache_key(self) -> Optional[list]:
+		"""The path, size and modification time of the executable"""
+		path = shutil.which(self.executable) or self.executable
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return None
+		return [abspath(path), stat.st_size, stat.st_mtime_ns]
+
+	def find_bundled(self, folder: str = None) -> bool:
+		"""Switches to a PolyConverter executable that includes .NET, if there is one in the folder"""
+		folder = getcwd() if folder is None else folder
+		for file in listdir(folder):
+			if isfile(pathjoin(folder, file)) and POLYCONVERTER_REGEX.match(file):
+				self.executable = file
+				return True
+		return False
+
+	def __str__(self):
+		return f"PolyConverter ({self.executable})"
+
+
+def check_converter(converter: PolyConverter) -> CompletedProcess:
+	"""Tests the converter, unless the same one passed the test before, in which case it isn't run again"""
+	key = converter.cache_key()
+	if key is not None and cache_files.read_json(CHECK_CACHE_FILE) == key:
+		return CompletedProcess("test", FILE_ERROR_CODE, b"", b"")
+	program = converter.test()
+	if key is not None and program.returncode == FILE_ERROR_CODE:
+		cache_files.write_json(CHECK_CACHE_FILE, key)
+	return program
+
+
+class BackgroundCheck:
+	"""Runs check_converter in a background thread, so that the editor can keep starting up in the meantime"""
+
+	def __init__(self, converter: PolyConverter):
+		self.converter = converter
+		self._program: Optional[CompletedProcess] = None
+		self._error: Optional[Exception] = None
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def _run(self):
+		try:
+			self._program = check_converter(self.converter)
+		except Exception as error:
+			self._error = error
+
+	def result(self) -> CompletedProcess:
+		"""Waits for the check to finish and returns the program, or raises the error it failed with"""
+		self._thread.join()
+		if self._error is not None:
+			raise self._error
+		return self._program
+
+
+class Preconverter:
+	"""Converts the stale .layout files of a folder in the background, most recently modified first, so that
+	opening them later only has to read the JSON. Each conversion is its own converter process, and at most
+	`workers` of them run at once. Conversions only start once `ready` returns True, which it's asked each time.
+	`converted` is called with each level that was converted successfully, from the thread that converted it."""
+
+	def __init__(self, converter: PolyConverter, levels: Iterable[LevelInfo], ready: Callable[[], bool],
+	             workers: int = PRECONVERT_WORKERS, converted: Callable[[LevelInfo], None] = None):
+		self.converter = converter
+		self._ready = ready
+		self._converted = converted
+		stale = sorted((info for info in levels if info.stale), key=lambda info: info.layout_stat[1], reverse=True)
+		self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Preconverter")
+		self._futures: Dict[str, Future] = {info.name: self._executor.submit(self._convert, info) for info in stale}
+
+	def _convert(self, info: LevelInfo) -> Optional[CompletedProcess]:
+		if not self._ready():
+			return None
+		program = self.converter.convert(info.layoutfile)
+		if program.returncode == SUCCESS_CODE and self._converted is not None:
+			self._converted(info)
+		return program
+
+	def cancel(self, keep: str = None):
+		"""Cancels every conversion that hasn't started, except the one of the level with the given name.
+		Conversions that already started are left to finish, so that no .layout.json is left half written."""
+		for name, future in self._futures.items():
+			if name != keep:
+				future.cancel()
+		self._executor.shutdown(wait=False)
+
+	def result(self, name: str) -> Optional[CompletedProcess]:
+		"""Waits for the conversion of a level and returns the finished program,
+		or None if it wasn't converted in the background"""
+		future = self._futures.get(name)
+		if future is None or future.cancelled() or future.exception() is not None:
+			return None
+		return future.result()
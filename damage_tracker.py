@@ -0,0 +1,99 @@
+from pygame import Rect
+from typing import *
+
+from math_objects import Vector
+from spatial_index import Bounds
+
+Number = Union[int, float]
+
+
+class DamageTracker:
+	"""Collects the areas of the screen that changed since the last frame, so that only those are redrawn.
+	Areas can be given in screen space, or in world space in which case they're converted when collected.
+	Tracked objects report their own changes, covering both where they were last drawn and where they are now."""
+
+	def __init__(self, margin: int = 0, world_margin: float = 0, merge_distance: int = 16, max_rects: int = 16):
+		"""The margin in pixels and the margin in world units are added around every world space area.
+		Areas closer than the merge distance in pixels are collected as one, and if there are still more than the
+		maximum number of areas they're all collected as one."""
+		self.margin = margin
+		self.world_margin = world_margin
+		self.merge_distance = merge_distance
+		self.max_rects = max_rects
+		self._full = True
+		self._rects: List[Rect] = []
+		self._bounds: List[Bounds] = []
+		self._tracked: Dict[Any, Bounds] = {}
+
+	def full(self):
+		"""Marks the whole screen as changed"""
+		self._full = True
+
+	def add_rect(self, rect: Union[Rect, Sequence[Number]]):
+		"""Marks an area of the screen as changed"""
+		self._rects.append(Rect(rect))
+
+	def add_bounds(self, bounds: Optional[Bounds]):
+		"""Marks an area of the world as changed"""
+		if bounds is not None:
+			self._bounds.append(bounds)
+
+	def track(self, obj):
+		"""Starts listening to an object's changes. The area it covers is marked as changed."""
+		self._tracked[obj] = bounds = obj.world_bounds
+		self.add_bounds(bounds)
+		obj.add_observer(self.object_changed)
+
+	def untrack(self, obj):
+		"""Stops listening to an object's changes. The area it last covered is marked as changed."""
+		if obj in self._tracked:
+			self.add_bounds(self._tracked.pop(obj))
+			obj.remove_observer(self.object_changed)
+
+	def object_changed(self, obj):
+		"""Marks both the previous and current area of an object as changed"""
+		self.add_bounds(self._tracked.get(obj))
+		self._tracked[obj] = bounds = obj.world_bounds
+		self.add_bounds(bounds)
+
+	def collect(self, camera: Vector, zoom: Number, size: Sequence[int]) -> Optional[List[Rect]]:
+		"""Returns the areas of the screen that changed since the last call, or None if nothing changed.
+		Areas that overlap or are close to each other are merged, and all of them are clipped to the screen.
+		Everything is marked as unchanged afterwards."""
+		screen = Rect(0, 0, size[0], size[1])
+		if self._full:
+			dirty = [screen]
+		else:
+			rects = self._rects
+			margin = self.margin + zoom * self.world_margin
+			for left, bottom, right, top in self._bounds:
+				rects.append(Rect(zoom * (left + camera[0]) - margin, -zoom * (top + camera[1]) - margin,
+				                  zoom * (right - left) + 2 * margin + 1, zoom * (top - bottom) + 2 * margin + 1))
+			dirty = merge_rects([clipped for rect in rects if (clipped := rect.clip(screen))], self.merge_distance)
+			if len(dirty) > self.max_rects:
+				dirty = [dirty[0].unionall(dirty[1:])]
+		self._full = False
+		self._rects = []
+		self._bounds = []
+		return dirty if dirty else None
+
+
+def merge_rects(rects: List[Rect], distance: int = 0) -> List[Rect]:
+	"""Merges rects that overlap or are at most a distance apart, until none of the resulting rects do"""
+	merged: List[Rect] = []
+	pending = sorted(rects, key=lambda r: r.w * r.h)
+	while pending:
+		rect = pending.pop()
+		while True:
+			reach = rect.inflate(2 * distance, 2 * distance)
+			hits = reach.collidelistall(pending)
+			merged_hits = reach.collidelistall(merged)
+			if not hits and not merged_hits:
+				break
+			rect = rect.unionall([pending[i] for i in hits] + [merged[i] for i in merged_hits])
+			for i in reversed(hits):
+				del pending[i]
+			for i in reversed(merged_hits):
+				del merged[i]
+		merged.append(rect)
+	return merged
@@ -4,25 +4,34 @@ os.environ["SDL_VIDEO_CENTERED"] = "1"
 
 import sys
 import pygame
-import re
 import json
 import traceback
 import threading
+import multiprocessing
 import PySimpleGUI as sg
-from os import getcwd, listdir
-from os.path import isfile, join as pathjoin, getmtime as lastmodified
+from os import getcwd
+from os.path import join as pathjoin
 from ctypes import WinDLL
 from uuid import uuid4
 from copy import deepcopy
 from time import sleep
 from itertools import chain
-from subprocess import run
 from typing import *
 
 import popup_windows as popup
 import layout_objects as lay
 import editor_events as ev
+from layout_io import LoadTimings, read_layout, snapshot_layout
+from level_catalog import LevelCatalog
+from thumbnails import ThumbnailGenerator
+from save_worker import SaveWorker
+from converter import PolyConverter, BackgroundCheck, Preconverter, check_converter, \
+	SUCCESS_CODE, FILE_ERROR_CODE, GAMEPATH_ERROR_CODE
 from math_objects import Vector
+from spatial_index import SpatialGrid
+from damage_tracker import DamageTracker
+from history import History
+from selection_transform import SelectionTransform
 
 # Window properties
 BASE_SIZE = (1200, 600)
@@ -30,6 +39,10 @@ FPS = 60
 ZOOM_MULT = 1.1
 ZOOM_MIN = 4
 ZOOM_MAX = 400
+VIEW_MARGIN = 8  # pixels around the screen in which objects are still drawn, for borders and highlights
+HEADER_HEIGHT = 30
+DAMAGE_TRACKING = True  # Only redraw the parts of the screen that changed
+SHOW_LOAD_TIMINGS = bool(os.environ.get("POLYEDITOR_TIMINGS"))  # Print how long each phase of opening a level took
 SAVE_LAYOUT_EVENT = pygame.USEREVENT + 1
 try:
 	KERNEL32 = WinDLL("kernel32")
@@ -56,22 +69,49 @@ except AttributeError:
 	TEMP_FILES = None
 	POLYCONVERTER = "PolyConverter.exe"
 	ICON = None
-JSON_EXTENSION = ".layout.json"
-LAYOUT_EXTENSION = ".layout"
-BACKUP_EXTENSION = ".layout.backup"
-FILE_REGEX = re.compile(f"^(.+)({JSON_EXTENSION}|{LAYOUT_EXTENSION})$")
-SUCCESS_CODE = 0
-JSON_ERROR_CODE = 1
-CONVERSION_ERROR_CODE = 2
-FILE_ERROR_CODE = 3
-GAMEPATH_ERROR_CODE = 4
-
-
-def load_level() -> Optional[Tuple[dict, str, str, str]]:
-	currentdir = getcwd()
-	filelist = [f for f in listdir(currentdir) if isfile(pathjoin(currentdir, f))]
-	levellist = [match.group(1) for f in filelist if (match := FILE_REGEX.match(f))]
-	levellist = list(dict.fromkeys(levellist))  # remove duplicates
+CONVERTER = PolyConverter(POLYCONVERTER)
+
+
+def ensure_converter(check: BackgroundCheck):
+	"""Waits for the converter check started at launch, and exits with a message if the converter doesn't work"""
+	lap = 0
+	while True:
+		lap += 1
+		program = check.result() if lap == 1 else check_converter(CONVERTER)
+		if program.returncode == GAMEPATH_ERROR_CODE:  # game install not found
+			popup.info("Problem", program.stdout.decode().strip())
+			sys.exit()
+		elif program.returncode == FILE_ERROR_CODE:  # as "test" is not a valid file
+			break  # All OK
+		else:
+			outputs = [program.stdout.decode().strip(), program.stderr.decode().strip()]
+			if lap == 1 and "dotnet" in outputs[1]:  # .NET not installed
+				if not CONVERTER.find_bundled():
+					popup.info("Problem",
+					           "It appears you don't have .NET installed.",
+					           "Please download the optional converter executable (which includes .NET) from "
+					           "https://github.com/JbCoder/PolyEditor/releases and place it in this same folder. "
+					           "Then run PolyEditor again.")
+					sys.exit()
+			else:
+				popup.info("Error", "Unexpected converter error:",
+				           "\n".join([o for o in outputs if len(o) > 0]))
+				sys.exit()
+
+
+def converter_ready(check: Optional[BackgroundCheck]) -> bool:
+	"""Whether the converter passed its check, waiting for it if it's still running"""
+	try:
+		return check is None or check.result().returncode == FILE_ERROR_CODE
+	except Exception:
+		return False
+
+
+def load_level(catalog: LevelCatalog, converter_check: BackgroundCheck = None
+               ) -> Optional[Tuple[dict, str, str, str, LoadTimings]]:
+	"""Lets the user pick a level from the catalog and opens it. The first time, the converter check that is
+	running in the background has to finish after the level is picked, before anything is converted."""
+	levellist = catalog.scan()
 
 	if len(levellist) == 0:
 		popup.info(
@@ -81,42 +121,65 @@ def load_level() -> Optional[Tuple[dict, str, str, str]]:
 		)
 		sys.exit()
 
-	leveltoedit = popup.selection("PolyEditor", "Choose a level to edit:", levellist)
+	# Stale levels are converted and thumbnails are drawn while the user picks a level
+	# The thumbnails of stale levels are only drawn once they're converted, as their JSON is out of date until then
+	thumbnails = ThumbnailGenerator(levellist)
+	preconverter = Preconverter(CONVERTER, levellist, lambda: converter_ready(converter_check),
+	                            converted=thumbnails.add)
+	leveltoedit = popup.selection("PolyEditor", "Choose a level to edit:", levellist,
+	                              preview=lambda info: thumbnails.get(info.name))
+	thumbnails.cancel()
 	if leveltoedit is None:
+		preconverter.cancel()
 		sys.exit()
+	preconverter.cancel(keep=leveltoedit.name)
+	if converter_check is not None:
+		ensure_converter(converter_check)
 
-	layoutfile = leveltoedit + LAYOUT_EXTENSION
-	jsonfile = leveltoedit + JSON_EXTENSION
-	backupfile = leveltoedit + BACKUP_EXTENSION
+	layoutfile = leveltoedit.layoutfile
+	jsonfile = leveltoedit.jsonfile
+	backupfile = leveltoedit.backupfile
 
-	if (
-			layoutfile in filelist
-			and (jsonfile not in filelist or lastmodified(layoutfile) > lastmodified(jsonfile))
-	):
-		program = run(f"{POLYCONVERTER} {layoutfile}", capture_output=True)
+	if leveltoedit.stale:
+		program = preconverter.result(leveltoedit.name) or CONVERTER.convert(layoutfile)
 		if program.returncode != SUCCESS_CODE:
 			outputs = [program.stdout.decode().strip(), program.stderr.decode().strip()]
 			popup.info("Error", f"There was a problem converting {layoutfile} to json:",
 			           "\n".join([o for o in outputs if len(o) > 0]))
 			return None
 
-	with open(jsonfile) as openfile:
-		try:
-			layout = json.load(openfile)
-			layout["m_Bridge"]["m_Anchors"] = layout["m_Anchors"]  # both should update together in real-time
-		except json.JSONDecodeError as error:
-			popup.info("Problem", "Couldn't open level:",
-			           f"Invalid syntax in line {error.lineno}, column {error.colno} of {jsonfile}")
-			return None
-		except ValueError:
-			popup.info("Problem", "Couldn't open level:",
-			           f"{jsonfile} is either incomplete or not actually a level")
-			return None
-
-	return layout, layoutfile, jsonfile, backupfile
-
-
-def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events: ev.EventCommunicator):
+	timings = LoadTimings()
+	try:
+		layout = read_layout(jsonfile, timings)
+		layout["m_Bridge"]["m_Anchors"] = layout["m_Anchors"]  # both should update together in real-time
+	except json.JSONDecodeError as error:
+		popup.info("Problem", "Couldn't open level:",
+		           f"Invalid syntax in line {error.lineno}, column {error.colno} of {jsonfile}")
+		return None
+	except ValueError:
+		popup.info("Problem", "Couldn't open level:",
+		           f"{jsonfile} is either incomplete or not actually a level")
+		return None
+
+	return layout, layoutfile, jsonfile, backupfile, timings
+
+
+def render_grid(size: Sequence[int], zoom: int, bg_color: Tuple[int, int, int], line_color: Tuple[int, int, int]):
+	"""Returns a surface with the background grid for the given window size and zoom. It has one extra cell on
+	each side, so that blitting it at (shift.x - 2 * zoom, -shift.y - zoom) covers the window for any shift."""
+	surface = pygame.Surface((size[0] + 2 * zoom, size[1] + 2 * zoom)).convert()
+	surface.fill(bg_color)
+	line_width = lay.scale(1, zoom)
+	width, height = surface.get_size()
+	for x in range(0, width, zoom):
+		pygame.draw.line(surface, line_color, (x, 0), (x, height), line_width)
+	for y in range(0, height, zoom):
+		pygame.draw.line(surface, line_color, (0, y), (width, y), line_width)
+	return surface
+
+
+def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, load_timings: LoadTimings,
+           events: ev.EventCommunicator):
 	zoom = 20
 	size = Vector(BASE_SIZE)
 	camera = Vector(0, 0)
@@ -127,10 +190,15 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 	draw_hitboxes = False
 	panning = False
 	selecting = False
+	selecting_rect: Optional[Tuple[int, int, int, int]] = None
+	box_selection: Set[lay.SelectableObject] = set()
+	box_cleared = False
 	moving = False
+	drag_transform: Optional[SelectionTransform] = None  # moves the selection while dragging it
 	point_moving = False
 	mouse_pos = Vector(0, 0)
 	old_mouse_pos = Vector(0, 0)
+	last_mouse_pos = Vector(0, 0)
 	old_true_mouse_pos = Vector(0, 0)
 	selecting_pos = Vector(0, 0)
 	dragndrop_pos = Vector(0, 0)
@@ -139,22 +207,138 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 	bg_color = BACKGROUND_BLUE
 	bg_color_2 = BACKGROUND_BLUE_GRID
 	fg_color = WHITE
-
-	object_lists = [
-		terrain_stretches := lay.LayoutList(lay.TerrainStretch, layout),
-		water_blocks := lay.LayoutList(lay.WaterBlock, layout),
-		platforms := lay.LayoutList(lay.Platform, layout),
-		ramps := lay.LayoutList(lay.Ramp, layout),
-		custom_shapes := lay.LayoutList(lay.CustomShape, layout),
-		pillars := lay.LayoutList(lay.Pillar, layout),
-		anchors := lay.LayoutList(lay.Anchor, layout)
-	]
-	objects: Dict[Type[lay.LayoutObject], lay.LayoutList] = {li.cls: li for li in object_lists}
-	bridge = lay.Bridge(layout)
+	last_scene = None
+	last_selecting_rect = None
+	grid_key = None
+	grid_surface: Optional[pygame.Surface] = None
+	last_pos_msg = None
+	save_status = ""
+
+	with load_timings.phase("wrap"):
+		# Anchors come first, so that shapes move their dynamic anchors through the same objects that are drawn
+		registry = lay.GuidRegistry()
+		anchors = lay.LayoutList(lay.Anchor, layout, registry)
+		object_lists = [
+			terrain_stretches := lay.LayoutList(lay.TerrainStretch, layout),
+			water_blocks := lay.LayoutList(lay.WaterBlock, layout),
+			platforms := lay.LayoutList(lay.Platform, layout),
+			ramps := lay.LayoutList(lay.Ramp, layout),
+			custom_shapes := lay.LayoutList(lay.CustomShape, layout, registry),
+			pillars := lay.LayoutList(lay.Pillar, layout),
+			anchors
+		]
+		objects: Dict[Type[lay.LayoutObject], lay.LayoutList] = {li.cls: li for li in object_lists}
+		bridge = lay.Bridge(layout, registry)
+	# Analytic hitboxes are just the shape's points, while masks are made before the first frame
+	with load_timings.phase("hitbox"):
+		if lay.HITBOX_BACKEND == lay.HITBOX_MASK:
+			for shape in custom_shapes:
+				shape.calculate_hitbox()
 
 	selectable_objects = lambda: tuple(chain(custom_shapes, pillars))
 	holding_shift = lambda: pygame.key.get_mods() & pygame.KMOD_SHIFT
 	true_mouse_pos = lambda: mouse_pos.flip_y() / zoom - camera
+	world_pos = lambda pos: Vector(pos[:2]).flip_y() / zoom - camera
+
+	# Spatial indexes of the objects, in drawing order, so that only those near the mouse are checked
+	# and only those inside the areas being redrawn are drawn
+	object_grids: Dict[Type[lay.LayoutObject], SpatialGrid] = {
+		cls: SpatialGrid() for cls in (lay.TerrainStretch, lay.WaterBlock, lay.Platform, lay.Ramp,
+		                               lay.CustomShape, lay.Pillar, lay.Anchor)
+	}
+	selectable_grids = {cls: object_grids[cls] for cls in (lay.CustomShape, lay.Pillar)}
+
+	def index_object(obj: lay.LayoutObject):
+		grid = object_grids[type(obj)]
+		grid.insert(obj)
+		obj.add_observer(grid.update)
+
+	def unindex_object(obj: lay.LayoutObject):
+		grid = object_grids[type(obj)]
+		grid.remove(obj)
+		obj.remove_observer(grid.update)
+
+	def selectable_in(rect: Sequence[float]) -> List[lay.SelectableObject]:
+		"""Selectable objects whose bounds overlap a rectangle on the screen, with the topmost first"""
+		(left, top), (right, bottom) = world_pos(rect[:2]), world_pos((rect[0] + rect[2], rect[1] + rect[3]))
+		found = chain(*(grid.query_rect((left, bottom, right, top)) for grid in selectable_grids.values()))
+		return list(reversed(list(found)))
+
+	def selectable_at(pos: Sequence[float], radius=0.0, cls: Type[lay.SelectableObject] = None):
+		"""Selectable objects whose bounds are within a world radius of a point on the screen, with the topmost first"""
+		grids = [selectable_grids[cls]] if cls else selectable_grids.values()
+		found = chain(*(grid.query_point(world_pos(pos), radius) for grid in grids))
+		return list(reversed(list(found)))
+
+	def select_in_box():
+		"""Selects the objects inside the selection rectangle, where they were last drawn"""
+		nonlocal box_cleared, box_selection
+		rect = selecting_rect
+		mask = lay.rect_hitbox_mask(rect, zoom) if lay.HITBOX_BACKEND == lay.HITBOX_MASK else None
+		hits = {obj for obj in selectable_in(rect) if obj.colliderect(rect, mask)}
+		if not holding_shift():
+			if not box_cleared:  # Everything outside of the selection is deselected
+				for obj in selectable_objects():
+					obj.selected = False
+				box_cleared = True
+			for obj in box_selection - hits:
+				obj.selected = False
+			box_selection = hits
+		else:  # multiselect
+			box_selection |= hits
+		for obj in hits:
+			obj.selected = True
+
+	# Areas of the screen to redraw in the next frame. Moving an anchor also changes the edges connected to it.
+	damage = DamageTracker(VIEW_MARGIN, lay.POINT_SELECTED_RADIUS)
+
+	# Edges are updated once per frame for all the anchors that moved, such as those of a dragged selection
+	moved_anchors: Dict[lay.Anchor, None] = {}
+
+	def anchor_moved(anchor: lay.Anchor):
+		moved_anchors[anchor] = None
+
+	def update_moved_anchors():
+		if not moved_anchors:
+			return
+		guids = [anchor.id for anchor in moved_anchors]
+		damage.add_bounds(bridge.joint_edges_bounds(*guids))
+		bridge.update_joints(moved_anchors)
+		damage.add_bounds(bridge.joint_edges_bounds(*guids))
+		moved_anchors.clear()
+
+	def track_object(obj: lay.LayoutObject):
+		damage.track(obj)
+		history.watch(obj)
+		if isinstance(obj, lay.Anchor):
+			bridge.invalidate()
+			obj.add_observer(anchor_moved)
+		index_object(obj)
+
+	def untrack_object(obj: lay.LayoutObject):
+		damage.untrack(obj)
+		history.unwatch(obj)
+		if isinstance(obj, lay.Anchor):
+			damage.add_bounds(bridge.joint_edges_bounds(obj.id))
+			bridge.invalidate()
+			obj.remove_observer(anchor_moved)
+			moved_anchors.pop(obj, None)
+		unindex_object(obj)
+		if isinstance(obj, lay.CustomShape):
+			lay.CustomShape.sprite_cache.discard(obj)
+
+	# Changes are recorded to be undone, and objects that undoing adds or removes are tracked like any other
+	history = History(track_object, untrack_object)
+	with load_timings.phase("wrap"):
+		for layout_object in chain(*object_lists):
+			track_object(layout_object)
+		for object_list in object_lists:
+			history.watch_list(object_list)
+	if SHOW_LOAD_TIMINGS:
+		print(f"Opened {jsonfile}: {load_timings}")
+
+	# Saving happens in the background, and the results are shown when they arrive
+	save_worker = SaveWorker(jsonfile, CONVERTER.convert)
 
 	# Start pygame
 	display = pygame.display.set_mode(size, pygame.RESIZABLE)
@@ -185,6 +369,9 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 		if (event := events.read()) is not None:
 
 			if event == ev.CLOSE_EDITOR:
+				save_worker.close()
+				# The cache is shared by every shape, so the next level would keep this one's shapes and sprites
+				lay.CustomShape.sprite_cache.clear()
 				pygame.quit()
 				events.send(ev.DONE)
 				return
@@ -247,7 +434,11 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 			if pyevent.type == pygame.QUIT:
 				events.send(ev.CLOSE_PROGRAM, force=True)
 
+			elif pyevent.type == pygame.VIDEOEXPOSE:
+				damage.full()
+
 			elif pyevent.type == pygame.ACTIVEEVENT:
+				damage.full()
 				if pyevent.state == 6 and not pyevent.gain:  # Minimized
 					object_being_edited = None
 					events.send(ev.CLOSE_OBJ_EDIT)
@@ -271,29 +462,7 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 				continue
 
 			elif pyevent.type == SAVE_LAYOUT_EVENT:
-				jsonstr = json.dumps(layout, indent=2)
-				jsonstr = re.sub(r"(\r\n|\r|\n)( ){6,}", r" ", jsonstr)  # limit depth to 3 levels
-				jsonstr = re.sub(r"(\r\n|\r|\n)( ){4,}([}\]])", r" \3", jsonstr)
-				with open(jsonfile, "w") as openfile:
-					openfile.write(jsonstr)
-				program = run(f"{POLYCONVERTER} {jsonfile}", capture_output=True)
-				if program.returncode == SUCCESS_CODE:
-					output = program.stdout.decode().strip()
-					if len(output) == 0:
-						events.send(popup.notif, "Saved! No new changes to apply.")
-						paused = True
-					else:
-						if "backup" in program.stdout.decode():
-							events.send(popup.notif, f"Saved level as {layoutfile}!",
-							                         f"(Copied original to {backupfile})")
-						else:
-							events.send(popup.notif, f"Saved level as {layoutfile}!", )
-				elif program.returncode == FILE_ERROR_CODE:  # failed to write file?
-					events.send(popup.notif, "Couldn't save:", program.stdout.decode().strip())
-				else:
-					outputs = [program.stdout.decode().strip(), program.stderr.decode().strip()]
-					events.send(popup.notif, f"Unexpected error while trying to save:",
-					                         "\n".join([o for o in outputs if len(o) > 0]))
+				save_worker.save(snapshot_layout(layout))
 
 			elif pyevent.type == pygame.MOUSEBUTTONDOWN:
 				if pyevent.button == 1:  # left click
@@ -304,19 +473,19 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 
 					if draw_points:
 						# Point editing
-						for obj in reversed(custom_shapes):
+						for obj in selectable_at(pyevent.pos, 2 * lay.POINT_SELECTED_RADIUS, lay.CustomShape):
 							if draw_points and obj.bounding_box.collidepoint(*pyevent.pos):
 								clicked_point = [p.collidepoint(pyevent.pos) for p in obj.point_hitboxes]
 								if holding_shift() and obj.add_point_hitbox:
 									if obj.add_point_hitbox.collidepoint(pyevent.pos):
 										obj.add_point(obj.add_point_closest[2], obj.add_point_closest[0])
-										obj.selected_point_index = obj.add_point_closest[2]
+										obj.start_moving_point(obj.add_point_closest[2])
 										point_moving = True
 										selected_shape = obj
 										break
 								elif True in clicked_point:
 									point_moving = True
-									obj.selected_point_index = clicked_point.index(True)
+									obj.start_moving_point(clicked_point.index(True))
 									selected_shape = obj
 									for o in selectable_objects():
 										o.selected = False
@@ -325,7 +494,7 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 									break
 					if not point_moving:
 						# Dragging and multiselect
-						for obj in reversed(selectable_objects()):
+						for obj in selectable_at(pyevent.pos):
 							if obj.collidepoint(pyevent.pos):
 								if not holding_shift():
 									moving = True
@@ -346,6 +515,8 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 							panning = True
 							dragndrop_pos = true_mouse_pos()
 						old_mouse_pos = Vector(pyevent.pos)
+					if moving or point_moving:  # the whole drag is undone at once
+						history.begin_group()
 
 				if pyevent.button == 3:  # right click
 					object_being_edited = None
@@ -353,7 +524,7 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 					# Delete point
 					deleted_point = False
 					if draw_points:
-						for obj in reversed(custom_shapes):
+						for obj in selectable_at(pyevent.pos, 2 * lay.POINT_SELECTED_RADIUS, lay.CustomShape):
 							if obj.bounding_box.collidepoint(*pyevent.pos):
 								for i, point in enumerate(obj.point_hitboxes):
 									if point.collidepoint(pyevent.pos):
@@ -367,6 +538,8 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 						if not point_moving or moving or holding_shift():
 							selecting_pos = Vector(pyevent.pos)
 							selecting = True
+							box_selection = set()
+							box_cleared = False
 
 				if pyevent.button == 4:  # mousewheel up
 					zoom_old_pos = true_mouse_pos()
@@ -392,9 +565,13 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 
 				if pyevent.button == 1:  # left click
 					if point_moving:
-						selected_shape.selected_point_index = None
+						selected_shape.stop_moving_point()
 						selected_shape = None
 						point_moving = False
+					if drag_transform is not None:
+						drag_transform.finish()
+						drag_transform = None
+					history.end_group()
 					if (
 							not holding_shift() and dragndrop_pos
 							and ((not panning and dragndrop_pos != true_mouse_pos())
@@ -450,18 +627,30 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 				elif pyevent.key == pygame.K_p:
 					draw_points = not draw_points
 
+				elif pyevent.key in (pygame.K_z, pygame.K_y) and pyevent.mod & pygame.KMOD_CTRL \
+						and not (moving or point_moving):
+					# Ctrl+Z undoes, Ctrl+Y and Ctrl+Shift+Z redo
+					if pyevent.key == pygame.K_z and not pyevent.mod & pygame.KMOD_SHIFT:
+						undone = history.undo()
+					else:
+						undone = history.redo()
+					if undone:
+						object_being_edited = None
+						events.send(ev.CLOSE_OBJ_EDIT)
+
 				elif pyevent.key == pygame.K_h:
 					draw_hitboxes = not draw_hitboxes
 
 				elif pyevent.key == pygame.K_d:
-					# Delete selected
-					for obj in [o for o in selectable_objects() if o.selected]:
-						if isinstance(obj, lay.CustomShape):
-							for dyn_anc_id in obj.dynamic_anchor_ids:
-								for anchor in [a for a in anchors]:
-									if anchor.id == dyn_anc_id:
-										anchors.remove(anchor)
-						objects[type(obj)].remove(obj)
+					# Delete selected, with the dynamic anchors of shapes, removing from each list at once
+					deleted = [o for o in selectable_objects() if o.selected]
+					deleted_anchors = list(dict.fromkeys(chain(*[registry.dynamic_anchors(obj) for obj in deleted
+					                                             if isinstance(obj, lay.CustomShape)])))
+					anchors.remove_many(deleted_anchors)
+					for layout_list in (custom_shapes, pillars):
+						layout_list.remove_many([obj for obj in deleted if isinstance(obj, layout_list.cls)])
+					for obj in chain(deleted_anchors, deleted):
+						untrack_object(obj)
 
 				elif pyevent.key == pygame.K_c:
 					# Copy Selected
@@ -471,22 +660,24 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 						new_obj.selected = True
 						if isinstance(old_obj, lay.CustomShape):
 							new_anchors = []
-							for i in range(len(old_obj.dynamic_anchor_ids)):
-								for anchor in [a for a in anchors if a.id == old_obj.dynamic_anchor_ids[i]]:
-									new_anchor = deepcopy(anchor)
-									new_anchor.id = str(uuid4())
-									new_anchors.append(new_anchor)
+							for anchor in registry.dynamic_anchors(old_obj):
+								new_anchor = lay.Anchor(deepcopy(anchor.dictionary))
+								new_anchor.id = str(uuid4())
+								new_anchors.append(new_anchor)
 							anchors.extend(new_anchors)
+							for new_anchor in new_anchors:
+								track_object(new_anchor)
 							new_obj.dynamic_anchor_ids = [a.id for a in new_anchors]
 							new_obj.anchors = new_anchors
 						new_obj.pos += (1, -1)
 						objects[type(new_obj)].append(new_obj)
+						track_object(new_obj)
 
 				elif pyevent.key == pygame.K_e:
 					# Popup window to edit object properties
 					hl_objs = [o for o in selectable_objects() if o.selected]
 					if len(hl_objs) == 0:  # under cursor
-						for obj in reversed(selectable_objects()):
+						for obj in selectable_at(mouse_pos):
 							if obj.collidepoint(mouse_pos):
 								obj.selected = True
 								hl_objs.append(obj)
@@ -531,34 +722,61 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 				# Move selection with keys
 				if move:
 					hl_objs = [o for o in selectable_objects() if o.selected]
-					for obj in hl_objs:
-						obj.pos += (move_x, move_y)
+					if drag_transform is not None:  # the drag continues from where this leaves the objects
+						drag_transform.finish()
+						drag_transform = None
+					nudge = SelectionTransform(hl_objs)
+					nudge.translate((move_x, move_y))
+					nudge.finish()
 					if len(hl_objs) == 0:
 						camera -= (move_x, move_y)
 					elif object_being_edited and len(hl_objs) == 1 and object_being_edited == hl_objs[0]:
 						events.send(ev.UPDATE_OBJ_EDIT,
 						            values={popup.POS_X: hl_objs[0].pos.x, popup.POS_Y: hl_objs[0].pos.y})
 
+		history.commit()
+
 		# Don't render while paused
 		if paused and not pause_force_render:
 			clock.tick(FPS)
 			continue
 
-		# Render background
-		display.fill(bg_color)
-		block_size = zoom
-		line_width = lay.scale(1, zoom)
-		shift = (camera * zoom % block_size).round()
-		for x in range(shift.x, size.x, block_size):
-			pygame.draw.line(display, bg_color_2, (x, 0), (x, size.y), line_width)
-		for y in range(-shift.y, size.y, block_size):
-			pygame.draw.line(display, bg_color_2, (0, y), (size.x, y), line_width)
+		# Process save results, which wait while paused so that they don't pop up over the menu
+		while not paused and (save_event := save_worker.events.read()) is not None:
+			if save_event == ev.SAVE_PROGRESS:
+				save_status = "Saving..." if save_event.stage == "writing" else "Converting..."
+				continue
+			save_status = ""
+			program = save_event.program
+			if save_event.error is not None:
+				events.send(popup.notif, "Couldn't save:", str(save_event.error))
+			elif program.returncode == SUCCESS_CODE:
+				output = program.stdout.decode().strip()
+				if len(output) == 0:
+					events.send(popup.notif, "Saved! No new changes to apply.")
+					paused = True
+				else:
+					if "backup" in program.stdout.decode():
+						events.send(popup.notif, f"Saved level as {layoutfile}!",
+						                         f"(Copied original to {backupfile})")
+					else:
+						events.send(popup.notif, f"Saved level as {layoutfile}!", )
+			elif program.returncode == FILE_ERROR_CODE:  # failed to write file?
+				events.send(popup.notif, "Couldn't save:", program.stdout.decode().strip())
+			else:
+				outputs = [program.stdout.decode().strip(), program.stderr.decode().strip()]
+				events.send(popup.notif, f"Unexpected error while trying to save:",
+				                         "\n".join([o for o in outputs if len(o) > 0]))
 
 		# Move selection with mouse
 		if moving:
 			hl_objs = [o for o in selectable_objects() if o.selected]
-			for obj in hl_objs:
-				obj.pos += true_mouse_pos() - old_true_mouse_pos
+			if drag_transform is None or drag_transform.objects != hl_objs:
+				if drag_transform is not None:
+					drag_transform.finish()
+				drag_transform = SelectionTransform(hl_objs)
+			drag_transform.translate(true_mouse_pos() - old_true_mouse_pos)
+			drag_transform.flush()
 			if object_being_edited and len(hl_objs) == 1 and object_being_edited == hl_objs[0]:
 				events.send(ev.UPDATE_OBJ_EDIT,
 				            values={popup.POS_X: hl_objs[0].pos.x, popup.POS_Y: hl_objs[0].pos.y})
@@ -566,70 +784,122 @@ def editor(layout: dict, layoutfile: str, jsonfile: str, backupfile: str, events
 		true_mouse_change = true_mouse_pos() - old_true_mouse_pos
 		old_true_mouse_pos = true_mouse_pos()
 
-		# Render Objects
-		for terrain in terrain_stretches:
-			terrain.render(display, camera, zoom, fg_color)
-		for water in water_blocks:
-			water.render(display, camera, zoom, fg_color)
-		for platform in platforms:
-			platform.render(display, camera, zoom)
-		for ramp in ramps:
-			ramp.render(display, camera, zoom)
-		shape_args = lay.ShapeRenderArgs(draw_points, draw_hitboxes, holding_shift(), mouse_pos, true_mouse_change)
-		for shape in custom_shapes:
-			shape.render(display, camera, zoom, shape_args)
-		for shape in custom_shapes:
-			shape.render_points(display, camera, zoom, shape_args)
-		if shape_args.top_point is not None:
-			color = lay.HIGHLIGHT_COLOR if shape_args.selected_point is not None else lay.POINT_COLOR
-			shape_args.top_point.render(display, color, round(zoom * lay.POINT_SELECTED_RADIUS))
-		for pillar in pillars:
-			pillar.render(display, camera, zoom, draw_hitboxes)
-		bridge.render(display, camera, zoom)
-		dyn_anc_ids = list(chain(*[shape.dynamic_anchor_ids for shape in custom_shapes]))
-		for anchor in anchors:
-			anchor.render(display, camera, zoom, dyn_anc_ids)
-
-		# Selecting shapes
+		# Find the area of the screen that changed since the last frame
+		pos_msg = f"[{round(true_mouse_pos().x, 2):>6},{round(true_mouse_pos().y, 2):>6}] {save_status}"
+		scene = (camera, zoom, size, bg_color, draw_hitboxes, draw_points, draw_points and holding_shift(), paused)
+		if scene != last_scene or not DAMAGE_TRACKING:
+			damage.full()
+			last_scene = scene
+		if pos_msg != last_pos_msg:
+			damage.add_rect((0, 0, size.x, HEADER_HEIGHT))
+			last_pos_msg = pos_msg
+		if mouse_pos != last_mouse_pos:
+			if draw_points:  # Points and the point to add are highlighted around the mouse
+				radius = round(zoom / 7 + zoom * lay.POINT_SELECTED_RADIUS) + VIEW_MARGIN
+				for pos in (mouse_pos, last_mouse_pos):
+					damage.add_rect((pos.x - radius, pos.y - radius, 2 * radius + 1, 2 * radius + 1))
+			last_mouse_pos = mouse_pos
+		if point_moving and any(true_mouse_change):
+			damage.add_bounds(selected_shape.world_bounds)
+		selecting_rect = None
 		if selecting:
-			rect = (min(selecting_pos.x, mouse_pos.x),
-			        min(selecting_pos.y, mouse_pos.y),
-			        abs(mouse_pos.x - selecting_pos.x),
-			        abs(mouse_pos.y - selecting_pos.y))
-			pygame.draw.rect(display, lay.SELECT_COLOR, rect, 1)
-			mask = lay.rect_hitbox_mask(rect, zoom)
-			for obj in selectable_objects():
-				if not holding_shift():
-					obj.selected = obj.colliderect(rect, mask)
-				elif obj.colliderect(rect, mask):  # multiselect
-					obj.selected = True
-
-		# Display mouse position, zoom and fps
+			selecting_rect = (min(selecting_pos.x, mouse_pos.x),
+			                  min(selecting_pos.y, mouse_pos.y),
+			                  abs(mouse_pos.x - selecting_pos.x),
+			                  abs(mouse_pos.y - selecting_pos.y))
+		if selecting_rect != last_selecting_rect:
+			for rect in (selecting_rect, last_selecting_rect):
+				if rect is not None:
+					damage.add_rect((rect[0], rect[1], rect[2] + 1, rect[3] + 1))
+			last_selecting_rect = selecting_rect
+		update_moved_anchors()
+		dirty = damage.collect(camera, zoom, size)
+		if dirty is None:
+			if selecting:
+				select_in_box()
+			pause_force_render = False
+			clock.tick(FPS)
+			continue
+
+		# Only draw the background grid again if the zoom, window size or colors changed
+		if grid_key != (zoom, size, bg_color, bg_color_2):
+			grid_key = (zoom, size, bg_color, bg_color_2)
+			grid_surface = render_grid(size, zoom, bg_color, bg_color_2)
+		shift = (camera * zoom % zoom).round()
+
+		# Mouse position, zoom and fps
 		font = pygame.font.SysFont("Courier", 20)
-		pos_msg = f"[{round(true_mouse_pos().x, 2):>6},{round(true_mouse_pos().y, 2):>6}]"
 		pos_text = font.render(pos_msg, True, fg_color)
-		display.blit(pos_text, (2, 5))
 		font = pygame.font.SysFont("Courier", 16)
 		zoom_msg = f"({zoom})"
 		zoom_size = font.size(zoom_msg)
 		zoom_text = font.render(zoom_msg, True, fg_color)
-		display.blit(zoom_text, (round(size[0] / 2 - zoom_size[0] / 2), 5))
 		fps_msg = str(round(clock.get_fps())).rjust(2)
 		fps_size = font.size(fps_msg)
 		fps_text = font.render(fps_msg, True, fg_color)
-		display.blit(fps_text, (size[0] - fps_size[0] - 5, 5))
 
-		# Display buttons
-		menu_button_rect = display.blit(menu_button, (10, size.y - menu_button.get_size()[1] - 10))
+		menu_button_rect = menu_button.get_rect(bottomleft=(10, size.y - 10))
+
+		# Render every area that changed on its own, skipping objects outside of it
+		margin = VIEW_MARGIN + zoom * lay.POINT_SELECTED_RADIUS
+		for rect in dirty:
+			display.set_clip(rect)
+			display.blit(grid_surface, (shift.x - 2 * zoom, -shift.y - zoom))
+
+			view_left, view_top = world_pos((rect.left - margin, rect.top - margin))
+			view_right, view_bottom = world_pos((rect.right + margin, rect.bottom + margin))
+			view = (view_left, view_bottom, view_right, view_top)
+			for terrain in object_grids[lay.TerrainStretch].query_rect(view):
+				terrain.render(display, camera, zoom, fg_color)
+			for water in object_grids[lay.WaterBlock].query_rect(view):
+				water.render(display, camera, zoom, fg_color)
+			for platform in object_grids[lay.Platform].query_rect(view):
+				platform.render(display, camera, zoom)
+			for ramp in object_grids[lay.Ramp].query_rect(view):
+				ramp.render(display, camera, zoom)
+			# The selected point is only moved by the mouse once, while the first area is rendered
+			mouse_change = true_mouse_change if rect is dirty[0] else Vector()
+			shape_args = lay.ShapeRenderArgs(draw_points, draw_hitboxes, holding_shift(), mouse_pos, mouse_change)
+			# The shape whose point is being moved is always rendered, as that is where the point is moved
+			visible_shapes = object_grids[lay.CustomShape].query_rect(view)
+			if point_moving and selected_shape not in visible_shapes:
+				visible_shapes.append(selected_shape)
+			for shape in visible_shapes:
+				shape.render(display, camera, zoom, shape_args)
+			for shape in visible_shapes:
+				shape.render_points(display, camera, zoom, shape_args)
+			if shape_args.top_point is not None:
+				color = lay.HIGHLIGHT_COLOR if shape_args.selected_point is not None else lay.POINT_COLOR
+				shape_args.top_point.render(display, color, round(zoom * lay.POINT_SELECTED_RADIUS))
+			for pillar in object_grids[lay.Pillar].query_rect(view):
+				pillar.render(display, camera, zoom, draw_hitboxes)
+			bridge.render(display, camera, zoom, view=view)
+			for anchor in object_grids[lay.Anchor].query_rect(view):
+				anchor.render(display, camera, zoom, registry.dynamic_anchor_ids)
+
+			if selecting:
+				pygame.draw.rect(display, lay.SELECT_COLOR, selecting_rect, 1)
+
+			# Display mouse position, zoom and fps
+			display.blit(pos_text, (2, 5))
+			display.blit(zoom_text, (round(size[0] / 2 - zoom_size[0] / 2), 5))
+			display.blit(fps_text, (size[0] - fps_size[0] - 5, 5))
+
+			# Display buttons
+			display.blit(menu_button, menu_button_rect)
+		display.set_clip(None)
 
+		if selecting:
+			select_in_box()
 		pause_force_render = False
-		pygame.display.flip()
+		if dirty[0].size == tuple(size):
+			pygame.display.flip()
+		else:
+			pygame.display.update(dirty)
 		clock.tick(FPS)
 
 
 def main():
-	global POLYCONVERTER
-
 	# PySimpleGUI
 	sg.LOOK_AND_FEEL_TABLE["PolyEditor"] = {
 		"BACKGROUND": "#1F2E3F",
@@ -653,44 +923,17 @@ def main():
 		if USER32:
 			USER32.ShowWindow(KERNEL32.GetConsoleWindow(), 0)
 
-	# Ensure the converter is working
-	lap = 0
-	while True:
-		lap += 1
-		program = run(f"{POLYCONVERTER} test", capture_output=True)
-		if program.returncode == GAMEPATH_ERROR_CODE:  # game install not found
-			popup.info("Problem", program.stdout.decode().strip())
-			sys.exit()
-		elif program.returncode == FILE_ERROR_CODE:  # as "test" is not a valid file
-			break  # All OK
-		else:
-			outputs = [program.stdout.decode().strip(), program.stderr.decode().strip()]
-			if lap == 1 and "dotnet" in outputs[1]:  # .NET not installed
-				currentdir = getcwd()
-				filelist = [f for f in listdir(currentdir) if isfile(pathjoin(currentdir, f))]
-				found = False
-				for file in filelist:
-					if re.compile(r"PolyConverter(.+)?\.exe$").match(file):
-						POLYCONVERTER = file
-						found = True
-						break
-				if not found:
-					popup.info("Problem",
-					           "It appears you don't have .NET installed.",
-					           "Please download the optional converter executable (which includes .NET) from "
-					           "https://github.com/JbCoder/PolyEditor/releases and place it in this same folder. "
-					           "Then run PolyEditor again.")
-					sys.exit()
-			else:
-				popup.info("Error", "Unexpected converter error:",
-				           "\n".join([o for o in outputs if len(o) > 0]))
-				sys.exit()
+	# The converter is checked while the user picks a level
+	converter_check = BackgroundCheck(CONVERTER)
+	catalog = LevelCatalog(getcwd())
 
 	# Main loop
 	close_program = False
 	while not close_program:
 
-		if not (editor_args := load_level()):
+		editor_args = load_level(catalog, converter_check)
+		converter_check = None  # it passed, as the program exits otherwise
+		if not editor_args:
 			continue
 
 		# We run the pygame-based editor in a secondary thread and any additional windows here in the main thread.
@@ -797,6 +1040,7 @@ def main():
 
 
 if __name__ == "__main__":
+	multiprocessing.freeze_support()  # thumbnails are drawn in other processes, which a bundled executable also runs
 	try:
 		main()
 	except Exception as main_exception:
@@ -8,6 +8,8 @@ OPEN_OBJ_EDIT = "openobj"
 UPDATE_OBJ_EDIT = "updateobj"
 CLOSE_OBJ_EDIT = "closeobj"
 RESTART_PROGRAM = "restart"
+SAVE_PROGRESS = "saveprogress"
+SAVE_DONE = "savedone"
 
 TIMEOUT = "__TIMEOUT__"
 
@@ -56,9 +58,9 @@ class EditorEvent:
 
 class EventCommunicator:
 	"""A wrapper to two queues, in order to send discrete events back and forth between two threads"""
-	def __init__(self, read_queue=Queue(), send_queue=Queue()):
-		self.read_queue = read_queue
-		self.send_queue = send_queue
+	def __init__(self, read_queue: Queue = None, send_queue: Queue = None):
+		self.read_queue = read_queue if read_queue is not None else Queue()
+		self.send_queue = send_queue if send_queue is not None else Queue()
 
 	def read(self, block=False, timeout: int = None) -> Optional[EditorEvent]:
 		"""Remove and return an item from the read_queue. Will be None if block is False and there are no events.
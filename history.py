@@ -0,0 +1,197 @@
+"""Undo and redo for the editor. Instead of copies of the layout, it keeps what changed: the old and new values of
+the keys that the setters of layout objects change, and the objects added to or removed from layout lists.
+Undoing a change takes as long as the change itself, no matter how big the level is."""
+import sys
+from collections import deque
+from typing import *
+
+from layout_objects import LayoutObject, LayoutList
+
+HISTORY_BUDGET = 32 * 1024 * 1024  # bytes of changes kept, the oldest are forgotten first
+
+
+def estimate_size(value) -> int:
+	"""Roughly how many bytes a value from the layout takes up, including what it contains"""
+	if isinstance(value, dict):
+		return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+	if isinstance(value, list):
+		return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+	return sys.getsizeof(value)
+
+
+class PropertyChange:
+	"""A key of an object's dictionary that changed from one value to another"""
+	__slots__ = ("obj", "key", "old", "new", "size")
+
+	def __init__(self, obj: LayoutObject, key: str, old, new):
+		self.obj = obj
+		self.key = key
+		self.old = old
+		self.new = new
+		self.size = estimate_size(old) + estimate_size(new)
+
+	def undo(self, history: 'History'):
+		self.obj._restore(self.key, self.old)
+
+	def redo(self, history: 'History'):
+		self.obj._restore(self.key, self.new)
+
+
+class ListChange:
+	"""An object that was inserted into a layout list at an index, or removed from that index"""
+	__slots__ = ("layout_list", "index", "obj", "inserted", "size")
+
+	def __init__(self, layout_list: LayoutList, index: int, obj: LayoutObject, inserted: bool):
+		self.layout_list = layout_list
+		self.index = index
+		self.obj = obj
+		self.inserted = inserted
+		self.size = estimate_size(obj.dictionary)
+
+	def _insert(self, history: 'History'):
+		self.layout_list.insert(self.index, self.obj)
+		history.on_added(self.obj)
+
+	def _remove(self, history: 'History'):
+		self.layout_list.remove(self.obj)
+		history.on_removed(self.obj)
+
+	def undo(self, history: 'History'):
+		if self.inserted:
+			self._remove(history)
+		else:
+			self._insert(history)
+
+	def redo(self, history: 'History'):
+		if self.inserted:
+			self._insert(history)
+		else:
+			self._remove(history)
+
+
+Change = Union[PropertyChange, ListChange]
+
+
+class HistoryEntry:
+	"""The changes that are undone together"""
+	__slots__ = ("changes", "size")
+
+	def __init__(self, changes: List[Change]):
+		self.changes = changes
+		self.size = sum(change.size for change in changes)
+
+
+class History:
+	"""Records the changes made to watched objects and lists. Changes are collected until commit() is called,
+	and then become a single entry that can be undone. Between begin_group() and end_group(), such as during a drag,
+	commit() waits, and every change to the same key of the same object is merged into one.
+	The entries take up at most `budget` bytes, forgetting the oldest ones to stay under it.
+	on_added and on_removed are called with the objects that undoing or redoing puts back or takes out of a list."""
+
+	def __init__(self, on_added: Callable[[LayoutObject], Any], on_removed: Callable[[LayoutObject], Any],
+	             budget: int = HISTORY_BUDGET):
+		self.on_added = on_added
+		self.on_removed = on_removed
+		self.budget = budget
+		self.size = 0
+		self._undo: Deque[HistoryEntry] = deque()
+		self._redo: List[HistoryEntry] = []
+		self._pending: List[Change] = []
+		self._pending_keys: Dict[Tuple[int, str], PropertyChange] = {}
+		self._groups = 0
+		self._applying = False
+
+	def watch(self, obj: LayoutObject):
+		obj.add_change_listener(self._property_changed)
+
+	def unwatch(self, obj: LayoutObject):
+		obj.remove_change_listener(self._property_changed)
+
+	def watch_list(self, layout_list: LayoutList):
+		layout_list.add_change_listener(self._list_changed)
+
+	def _property_changed(self, obj: LayoutObject, key: str, old, new):
+		if self._applying:
+			return
+		merged = self._pending_keys.get((id(obj), key))
+		if merged is not None and merged.obj is obj:
+			merged.new = new
+			merged.size = estimate_size(merged.old) + estimate_size(new)
+			return
+		change = PropertyChange(obj, key, old, new)
+		self._pending.append(change)
+		self._pending_keys[(id(obj), key)] = change
+
+	def _list_changed(self, layout_list: LayoutList, index: int, obj: LayoutObject, inserted: bool):
+		if not self._applying:
+			self._pending.append(ListChange(layout_list, index, obj, inserted))
+
+	def begin_group(self):
+		"""Makes the changes until end_group() be a single entry, like those of a whole drag"""
+		self._groups += 1
+
+	def end_group(self):
+		self._groups = max(0, self._groups - 1)
+		self.commit()
+
+	def commit(self):
+		"""Turns the changes made since the last commit into an entry, unless a group is still going on"""
+		if self._groups or not self._pending:
+			return
+		entry = HistoryEntry(self._pending)
+		self._pending, self._pending_keys = [], {}
+		for redo_entry in self._redo:
+			self.size -= redo_entry.size
+		self._redo.clear()
+		self._undo.append(entry)
+		self.size += entry.size
+		while self.size > self.budget and self._undo:
+			self.size -= self._undo.popleft().size
+
+	def _apply(self, entry: HistoryEntry, undo: bool):
+		self._applying = True
+		try:
+			if undo:
+				for change in reversed(entry.changes):
+					change.undo(self)
+			else:
+				for change in entry.changes:
+					change.redo(self)
+		finally:
+			self._applying = False
+
+	def undo(self) -> bool:
+		"""Undoes the last entry, including changes that weren't committed yet. Returns whether there was one."""
+		self._groups = 0
+		self.commit()
+		if not self._undo:
+			return False
+		entry = self._undo.pop()
+		self._apply(entry, undo=True)
+		self._redo.append(entry)
+		return True
+
+	def redo(self) -> bool:
+		"""Redoes the last entry that was undone, if nothing changed since. Returns whether there was one."""
+		self._groups = 0
+		self.commit()
+		if not self._redo:
+			return False
+		entry = self._redo.pop()
+		self._apply(entry, undo=False)
+		self._undo.append(entry)
+		return True
+
+	@property
+	def can_undo(self) -> bool:
+		return bool(self._undo or self._pending)
+
+	@property
+	def can_redo(self) -> bool:
+		return bool(self._redo) and not self._pending
+
+	def clear(self):
+		self._undo.clear()
+		self._redo.clear()
+		self._pending, self._pending_keys = [], {}
+		self.size = 0
@@ -0,0 +1,180 @@
+import re
+import json
+from json.encoder import encode_basestring_ascii, INFINITY
+from contextlib import contextmanager
+from time import perf_counter
+from typing import *
+
+# The fastest JSON parser available. It's only used for files that it reads exactly like the standard library:
+# the others can't read NaN and Infinity, which are saved for non-finite floats, and read integers that don't fit
+# in 64 bits as floats. Numbers with that many digits are rare, so files that have them are read by json instead.
+try:
+	import orjson
+	JSON_PARSER = "orjson"
+	_loads = orjson.loads
+except ImportError:
+	try:
+		import simdjson
+		JSON_PARSER = "simdjson"
+		_loads = simdjson.loads
+	except ImportError:
+		JSON_PARSER = "json"
+		_loads = json.loads
+
+_LONG_NUMBER = re.compile(r"\d{19,}")
+_LONG_NUMBER_BYTES = re.compile(rb"\d{19,}")
+
+
+class LoadTimings:
+	"""How long each phase of opening a level took, in seconds"""
+
+	def __init__(self):
+		self.phases: Dict[str, float] = {}
+
+	@contextmanager
+	def phase(self, name: str):
+		"""Times the code inside a with block, adding it to the phase with the given name"""
+		start = perf_counter()
+		try:
+			yield
+		finally:
+			self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+
+	@property
+	def total(self) -> float:
+		return sum(self.phases.values())
+
+	def __str__(self):
+		return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items()) \
+		       + f", total {self.total * 1000:.0f}ms"
+
+
+def parse_layout(data: Union[bytes, str]) -> dict:
+	"""Parses the contents of a .layout.json file, the same way json.loads does.
+	Invalid JSON raises a json.JSONDecodeError with the line and column."""
+	if _loads is json.loads:
+		return json.loads(data)
+	long_number = _LONG_NUMBER_BYTES if isinstance(data, bytes) else _LONG_NUMBER
+	if long_number.search(data):
+		return json.loads(data)
+	try:
+		return _loads(data)
+	except ValueError:
+		return json.loads(data)  # also reads NaN and Infinity, and raises the same error as usual otherwise
+
+
+def read_layout(path: str, timings: LoadTimings = None) -> dict:
+	"""Reads and parses a .layout.json file, adding the time it took to the read and parse phases"""
+	if timings is None:
+		timings = LoadTimings()
+	with timings.phase("read"):
+		with open(path, "rb") as openfile:
+			data = openfile.read()
+	with timings.phase("parse"):
+		return parse_layout(data)
+
+
+# The layout is saved with each object on its own line: only the first two levels of nesting are indented
+WRITE_CHUNK_SIZE = 64 * 1024  # characters
+
+
+def _scalar(value) -> str:
+	"""A single value as JSON, exactly like json.dumps writes it"""
+	if isinstance(value, str):
+		return encode_basestring_ascii(value)
+	if value is None:
+		return "null"
+	if value is True:
+		return "true"
+	if value is False:
+		return "false"
+	if isinstance(value, int):
+		return int.__repr__(value)
+	if isinstance(value, float):
+		if value != value:
+			return "NaN"
+		if value == INFINITY:
+			return "Infinity"
+		if value == -INFINITY:
+			return "-Infinity"
+		return float.__repr__(value)
+	raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _key(key) -> str:
+	"""A dictionary key as JSON, which json.dumps converts to a string if it isn't one"""
+	if isinstance(key, str):
+		return encode_basestring_ascii(key)
+	if isinstance(key, (int, float, bool)) or key is None:
+		return encode_basestring_ascii(_scalar(key))
+	raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _inline(value) -> str:
+	"""A value written on a single line, with spaces inside the brackets"""
+	if isinstance(value, dict):
+		if not value:
+			return "{}"
+		return "{ " + ", ".join(_key(k) + ": " + _inline(v) for k, v in value.items()) + " }"
+	if isinstance(value, (list, tuple)):
+		if not value:
+			return "[]"
+		return "[ " + ", ".join(map(_inline, value)) + " ]"
+	return _scalar(value)
+
+
+def _iter_json(value, level: int) -> Iterator[str]:
+	"""Yields a value at the given level of nesting in pieces. Containers at the first two levels have each item
+	on its own line, and everything deeper is written on the same line as the item that contains it."""
+	if level >= 2 or not value or not isinstance(value, (dict, list, tuple)):
+		yield _inline(value)
+		return
+	indent = "\n" + "  " * (level + 1)
+	separator = indent
+	if isinstance(value, dict):
+		yield "{"
+		for key, item in value.items():
+			yield separator + _key(key) + ": "
+			yield from _iter_json(item, level + 1)
+			separator = "," + indent
+		yield "\n" + "  " * level + "}"
+	else:
+		yield "["
+		for item in value:
+			yield separator
+			yield from _iter_json(item, level + 1)
+			separator = "," + indent
+		yield "\n" + "  " * level + "]"
+
+
+def iter_layout(layout: dict) -> Iterator[str]:
+	"""Yields the layout as JSON in pieces, in the format that is saved"""
+	return _iter_json(layout, 0)
+
+
+def dumps_layout(layout: dict) -> str:
+	"""Returns the layout as JSON, in the format that is saved"""
+	return "".join(iter_layout(layout))
+
+
+def write_layout(layout: dict, path: str):
+	"""Writes the layout to a .layout.json file a chunk at a time, without ever holding all of the text"""
+	with open(path, "w") as openfile:
+		chunk, chunk_size = [], 0
+		for piece in iter_layout(layout):
+			chunk.append(piece)
+			chunk_size += len(piece)
+			if chunk_size >= WRITE_CHUNK_SIZE:
+				openfile.write("".join(chunk))
+				chunk, chunk_size = [], 0
+		openfile.write("".join(chunk))
+
+
+def snapshot_layout(value):
+	"""Copies the dictionaries and lists of a layout, so that it can be saved while the original keeps changing.
+	Strings and numbers can't change, so they're shared."""
+	if isinstance(value, dict):
+		return {k: snapshot_layout(v) if isinstance(v, (dict, list)) else v for k, v in value.items()}
+	if isinstance(value, list):
+		return [snapshot_layout(v) if isinstance(v, (dict, list)) else v for v in value]
+	return value
@@ -1,14 +1,24 @@
 import math
+import numpy as np
 import pygame
 import pygame.gfxdraw
+import pygame.surfarray
 from pygame import Surface, Rect
 from pygame.mask import MaskType as Mask, Mask as mask_from_size, from_surface as mask_from_surface
-from itertools import chain
+from itertools import chain, islice
+from contextlib import contextmanager
 from typing import *
 
-from math_objects import Vector
+from math_objects import Vector, PointArray, affine_matrix
+from spatial_index import Bounds, overlaps, overlaps_many
+from sprite_cache import SpriteCache
+from collision import point_in_polygon, polygon_overlaps_rect
+from layout_io import snapshot_layout
 
-HITBOX_RESOLUTION = 40
+HITBOX_MASK = "mask"
+HITBOX_ANALYTIC = "analytic"
+HITBOX_BACKEND = HITBOX_MASK  # how custom shapes are checked for collisions, HITBOX_ANALYTIC is opt-in
+HITBOX_RESOLUTION = 40  # pixels per unit of the masks, when HITBOX_MASK is used
 DUMMY_SURFACE = Surface((0, 0))
 
 WHITE = (255, 255, 255)
@@ -73,10 +83,102 @@ class LayoutObject:
 
 	def __init__(self, dictionary):
 		self._dict = dictionary
+		self._version = 0
+		self._observers: List[Callable[['LayoutObject'], Any]] = []
+		self._listeners: List[Callable[['LayoutObject', str, Any, Any], Any]] = []
+		self._registry: Optional['GuidRegistry'] = None
+		self._bounds: Bounds = (0, 0, 0, 0)
+		self._bounds_version = -1
 
 	def render(self, display: Surface, camera: Vector, zoom: int, args=None):
 		raise NotImplementedError(f"{type(self).render}")
 
+	def _calculate_bounds(self) -> Bounds:
+		raise NotImplementedError(f"{type(self)._calculate_bounds}")
+
+	@property
+	def world_bounds(self) -> Bounds:
+		"""The smallest rectangle in world space that contains the object. It's cached until the geometry changes."""
+		if self._bounds_version != self._version:
+			self._bounds = self._calculate_bounds()
+			self._bounds_version = self._version
+		return self._bounds
+
+	def visible(self, view: Bounds) -> bool:
+		"""Whether any part of the object is inside a rectangle in world space"""
+		return overlaps(self.world_bounds, view)
+
+	@property
+	def version(self) -> int:
+		"""A number that changes every time the object's geometry changes"""
+		return self._version
+
+	def add_observer(self, callback: Callable[['LayoutObject'], Any]):
+		"""Registers a function to be called with this object every time its geometry or appearance changes"""
+		self._observers.append(callback)
+
+	def remove_observer(self, callback: Callable[['LayoutObject'], Any]):
+		self._observers.remove(callback)
+
+	def add_change_listener(self, callback: Callable[['LayoutObject', str, Any, Any], Any]):
+		"""Registers a function to be called with this object, a key of its dictionary, and copies of the old and new
+		values every time a setter changes that key"""
+		self._listeners.append(callback)
+
+	def remove_change_listener(self, callback: Callable[['LayoutObject', str, Any, Any], Any]):
+		self._listeners.remove(callback)
+
+	def _snapshot(self, keys: Sequence[str]) -> Optional[list]:
+		"""Copies of the values of keys of the dictionary, or None if there are no change listeners to tell about them"""
+		if not self._listeners:
+			return None
+		return [snapshot_layout(self._dict.get(key)) for key in keys]
+
+	def _report(self, keys: Sequence[str], old_values: Optional[list]):
+		"""Lets the change listeners know about the keys that changed since their values were copied by _snapshot()"""
+		if old_values is None:
+			return
+		for key, old in zip(keys, old_values):
+			new = self._dict.get(key)
+			if new != old:
+				new = snapshot_layout(new)
+				for callback in self._listeners:
+					callback(self, key, old, new)
+
+	@contextmanager
+	def _recording(self, *keys: str):
+		"""Lets the change listeners know about the keys of the dictionary that change inside a with block"""
+		old_values = self._snapshot(keys)
+		yield
+		self._report(keys, old_values)
+
+	@contextmanager
+	def _renaming(self):
+		"""Keeps the GUID registry of the object up to date when GUIDs of the object change inside a with block"""
+		registry = self._registry
+		if registry is None:
+			yield
+			return
+		registry.remove(self)
+		yield
+		registry.add(self)
+
+	def _restore(self, key: str, value):
+		"""Puts back a value of the dictionary that a change listener was given, without running any setter"""
+		with self._renaming():
+			self._dict[key] = snapshot_layout(value)
+		self._changed()
+
+	def _notify(self):
+		"""Calls the observers, to let them know that the object looks different"""
+		for callback in self._observers:
+			callback(self)
+
+	def _changed(self):
+		"""Marks the object's geometry as changed, so that anything calculated from it is recalculated"""
+		self._version += 1
+		self._notify()
+
 	@property
 	def dictionary(self) -> dict:
 		return self._dict
@@ -86,7 +188,9 @@ class LayoutObject:
 		return Vector(self._dict["m_Pos"])
 	@pos.setter
 	def pos(self, value: Vector):
-		value.to_dict(self._dict["m_Pos"])
+		with self._recording("m_Pos"):
+			value.to_dict(self._dict["m_Pos"])
+		self._changed()
 
 	def __repr__(self):
 		return self._dict
@@ -99,7 +203,7 @@ class SelectableObject(LayoutObject):
 	"""A LayoutObject that can be selected and moved around"""
 	def __init__(self, dictionary: dict):
 		super().__init__(dictionary)
-		self.selected = False
+		self._selected = False
 		self._hitbox: Optional[Mask] = None
 		self._center_offset = Vector(0, 0)
 		self._last_zoom: int = 1
@@ -109,6 +213,15 @@ class SelectableObject(LayoutObject):
 		self._last_zoom = zoom
 		self._last_camera = camera
 
+	@property
+	def selected(self) -> bool:
+		return self._selected
+	@selected.setter
+	def selected(self, value: bool):
+		if value != self._selected:
+			self._selected = value
+			self._notify()
+
 	def collidepoint(self, point: Sequence[Number]) -> bool:
 		mask_size = Vector(self._hitbox.get_size())
 		point = Vector(point[:2]) / self._last_zoom - self._last_camera.flip_y() - self.pos[:2].flip_y()
@@ -126,33 +239,181 @@ class SelectableObject(LayoutObject):
 		return bool(self._hitbox.overlap(mask, point))
 
 
+class GuidRegistry:
+	"""Finds the anchors and bridge joints of a layout by their GUID, and the custom shape that each dynamic anchor
+	belongs to. Layout lists and the bridge that are given a registry keep it up to date, as do the objects in them
+	when their GUIDs change."""
+	def __init__(self):
+		self.anchors: Dict[str, Anchor] = {}
+		self.joints: Dict[str, dict] = {}
+		self.owners: Dict[str, CustomShape] = {}
+
+	def add(self, obj: LayoutObject):
+		if isinstance(obj, Anchor):
+			self.anchors[obj.id] = obj
+		elif isinstance(obj, CustomShape):
+			for guid in obj.dynamic_anchor_ids:
+				self.owners[guid] = obj
+		else:
+			return
+		obj._registry = self
+
+	def remove(self, obj: LayoutObject):
+		if obj._registry is not self:
+			return
+		if isinstance(obj, Anchor):
+			if self.anchors.get(obj.id) is obj:
+				del self.anchors[obj.id]
+		elif isinstance(obj, CustomShape):
+			for guid in obj.dynamic_anchor_ids:
+				if self.owners.get(guid) is obj:
+					del self.owners[guid]
+		obj._registry = None
+
+	def set_joints(self, joints: Iterable[dict]):
+		self.joints = {j["m_Guid"]: j for j in joints}
+
+	def anchor(self, guid: str) -> Optional['Anchor']:
+		return self.anchors.get(guid)
+
+	def joint(self, guid: str) -> Optional[dict]:
+		"""The dictionary of a bridge joint that isn't an anchor"""
+		return self.joints.get(guid)
+
+	def owner(self, guid: str) -> Optional['CustomShape']:
+		"""The custom shape that has an anchor as one of its dynamic anchors"""
+		return self.owners.get(guid)
+
+	def dynamic_anchors(self, shape: 'CustomShape') -> List['Anchor']:
+		"""The anchors that exist among the dynamic anchors of a custom shape"""
+		return [self.anchors[i] for i in shape.dynamic_anchor_ids if i in self.anchors]
+
+	@property
+	def dynamic_anchor_ids(self) -> KeysView[str]:
+		return self.owners.keys()
+
+
 LayoutT = TypeVar("LayoutT", bound=LayoutObject)
 class LayoutList(Sequence[LayoutT]):
-	"""Acts a wrapper for a list of dictionaries in the layout, allowing you to treat them as objects"""
-	def __init__(self, cls: Type[LayoutT], layout: dict):
+	"""Acts a wrapper for a list of dictionaries in the layout, allowing you to treat them as objects.
+	Objects are found by identity, through an index of their positions. Adding or removing an object only updates
+	the positions of the objects after it, and removing many at once rebuilds the index.
+	If a GUID registry is given, the objects that are added or removed are added to it or removed from it.
+	Custom shapes find their dynamic anchors in the registry, so the anchors should be wrapped first."""
+	def __init__(self, cls: Type[LayoutT], layout: dict, registry: GuidRegistry = None):
 		self.cls = cls
 		self._dictlist = layout[cls.list_name]
+		self._registry = registry
 		if cls is CustomShape:
-			anchorsList = [Anchor(a) for a in layout[Anchor.list_name]]
-			self._objlist = [CustomShape(o, anchorsList) for o in self._dictlist]
+			if registry is not None:
+				anchors = registry.anchors
+			else:
+				anchors = {a["m_Guid"]: Anchor(a) for a in layout[Anchor.list_name]}
+			self._objlist = [CustomShape(o, anchors) for o in self._dictlist]
 		else:
 			self._objlist = [cls(o) for o in self._dictlist]
+		if registry is not None:
+			for obj in self._objlist:
+				registry.add(obj)
+		self._positions: Optional[Dict[int, int]] = None  # indices by id of the objects
+		self._listeners: List[Callable[['LayoutList', int, LayoutT, bool], Any]] = []
+
+	def add_change_listener(self, callback: Callable[['LayoutList', int, LayoutT, bool], Any]):
+		"""Registers a function to be called with this list, an index, an object, and whether the object was
+		inserted at that index or removed from it, every time an object is added or removed"""
+		self._listeners.append(callback)
+
+	def remove_change_listener(self, callback: Callable[['LayoutList', int, LayoutT, bool], Any]):
+		self._listeners.remove(callback)
+
+	def _record(self, index: int, elem: LayoutT, inserted: bool):
+		if self._registry is not None:
+			if inserted:
+				self._registry.add(elem)
+			else:
+				self._registry.remove(elem)
+		for callback in self._listeners:
+			callback(self, index, elem, inserted)
+
+	def _index(self) -> Dict[int, int]:
+		if self._positions is None:
+			self._positions = {id(obj): i for i, obj in enumerate(self._objlist)}
+		return self._positions
+
+	def index(self, elem: LayoutT) -> int:
+		"""The position of an object in the list, which must be that same object and not a copy"""
+		i = self._index().get(id(elem))
+		if i is None:
+			raise ValueError(f"{type(elem).__name__} is not in the list")
+		return i
+
+	def __contains__(self, elem) -> bool:
+		return id(elem) in self._index()
 
 	def append(self, elem: LayoutT):
 		self._dictlist.append(elem.dictionary)
 		self._objlist.append(elem)
+		if self._positions is not None:
+			self._positions[id(elem)] = len(self._objlist) - 1
+		self._record(len(self._objlist) - 1, elem, True)
 
 	def extend(self, elems: Sequence[LayoutT]):
+		"""Adds objects to the end of the list, extending both lists once"""
+		start = len(self._objlist)
 		self._dictlist.extend([e.dictionary for e in elems])
 		self._objlist.extend(elems)
+		if self._positions is not None:
+			self._positions.update((id(elem), i) for i, elem in enumerate(elems, start))
+		for i, elem in enumerate(elems, start):
+			self._record(i, elem, True)
+
+	extend_many = extend  # the counterpart of remove_many
+
+	def _shift_positions(self, start: int):
+		"""Updates the positions of the objects from an index on, which are the only ones that moved"""
+		if self._positions is not None:
+			self._positions.update((id(obj), i) for i, obj in enumerate(islice(self._objlist, start, None), start))
+
+	def insert(self, index: int, elem: LayoutT):
+		self._dictlist.insert(index, elem.dictionary)
+		self._objlist.insert(index, elem)
+		self._shift_positions(index)
+		self._record(index, elem, True)
 
 	def remove(self, elem: LayoutT):
-		self._dictlist.remove(elem.dictionary)
-		self._objlist.remove(elem)
+		index = self.index(elem)
+		del self._dictlist[index]
+		del self._objlist[index]
+		del self._positions[id(elem)]
+		self._shift_positions(index)
+		self._record(index, elem, False)
+
+	def remove_many(self, elems: Iterable[LayoutT]):
+		"""Removes many objects at once, rebuilding both lists in a single pass instead of shifting them for each one.
+		Removals are reported from the last index to the first, as if the objects had been removed in that order."""
+		indices = self._index()
+		removed = set()
+		for elem in elems:
+			i = indices.get(id(elem))
+			if i is None:
+				raise ValueError(f"{type(elem).__name__} is not in the list")
+			removed.add(i)
+		if not removed:
+			return
+		old_objlist = self._objlist[:]
+		self._dictlist[:] = [d for i, d in enumerate(self._dictlist) if i not in removed]
+		self._objlist[:] = [o for i, o in enumerate(old_objlist) if i not in removed]
+		self._positions = None
+		for index in sorted(removed, reverse=True):
+			self._record(index, old_objlist[index], False)
 
 	def clear(self):
+		removed = list(enumerate(self._objlist))
 		self._dictlist.clear()
 		self._objlist.clear()
+		self._positions = None
+		for index, elem in reversed(removed):
+			self._record(index, elem, False)
 
 	def __len__(self) -> int:
 		return self._objlist.__len__()
@@ -170,12 +431,8 @@ class Anchor(LayoutObject):
 	def __init__(self, dictionary):
 		super().__init__(dictionary)
 
-	def render(self, display: Surface, camera: Vector, zoom: int, dynamic_anchor_ids=tuple()):
-		color = ANCHOR_COLOR
-		for dyn_anc_id in dynamic_anchor_ids:
-			if self.id == dyn_anc_id:
-				color = DYNAMIC_ANCHOR_COLOR
-				break
+	def render(self, display: Surface, camera: Vector, zoom: int, dynamic_anchor_ids: Container[str] = frozenset()):
+		color = DYNAMIC_ANCHOR_COLOR if self.id in dynamic_anchor_ids else ANCHOR_COLOR
 		rect = (round(zoom * (self.pos.x + camera.x - ANCHOR_RADIUS)),
 		        round(zoom * -(self.pos.y + camera.y + ANCHOR_RADIUS)),
 		        round(zoom * ANCHOR_RADIUS * 2),
@@ -183,12 +440,17 @@ class Anchor(LayoutObject):
 		pygame.draw.rect(display, color, rect)
 		pygame.draw.rect(display, ANCHOR_BORDER, rect, max(1, round(rect[2] / 15)))
 
+	def _calculate_bounds(self) -> Bounds:
+		x, y = self._dict["m_Pos"]["x"], self._dict["m_Pos"]["y"]
+		return x - ANCHOR_RADIUS, y - ANCHOR_RADIUS, x + ANCHOR_RADIUS, y + ANCHOR_RADIUS
+
 	@property
 	def id(self) -> str:
 		return self._dict["m_Guid"]
 	@id.setter
 	def id(self, value: str):
-		self._dict["m_Guid"] = value
+		with self._renaming(), self._recording("m_Guid"):
+			self._dict["m_Guid"] = value
 
 
 class TerrainStretch(LayoutObject):
@@ -198,19 +460,28 @@ class TerrainStretch(LayoutObject):
 		super().__init__(dictionary)
 
 	def render(self, display: Surface, camera: Vector, zoom: int, color=WHITE):
-		if self.width == TERRAIN_MAIN_WIDTH:  # main terrain
-			x = zoom * (self.pos.x - (0 if self.flipped else self.width) + camera.x)
-		else:
-			x = zoom * (self.pos.x - self.width / 2 * (-1 if self.flipped else 1) + camera.y)
-		rect = (round(x), round(zoom * -(self.height + camera.y)), round(zoom * self.width), round(zoom * self.height))
+		rect = (round(zoom * (self.left + camera.x)), round(zoom * -(self.height + camera.y)),
+		        round(zoom * self.width), round(zoom * self.height))
 		pygame.draw.rect(display, color, rect, scale(TERRAIN_BORDER_WIDTH, zoom))
 
+	def _calculate_bounds(self) -> Bounds:
+		return self.left, 0, self.left + self.width, self.height
+
+	@property
+	def left(self) -> float:
+		"""The world position of the left side of the terrain"""
+		if self.width == TERRAIN_MAIN_WIDTH:  # main terrain
+			return self.pos.x - (0 if self.flipped else self.width)
+		return self.pos.x - self.width / 2 * (-1 if self.flipped else 1)
+
 	@property
 	def flipped(self) -> bool:
 		return self._dict["m_Flipped"]
 	@flipped.setter
 	def flipped(self, value: bool):
-		self._dict["m_Flipped"] = value
+		with self._recording("m_Flipped"):
+			self._dict["m_Flipped"] = value
+		self._changed()
 
 	@property
 	def width(self) -> float:
@@ -232,19 +503,27 @@ class WaterBlock(LayoutObject):
 		end = start + (zoom * self.width, 0)
 		pygame.draw.line(display, color, start, end, scale(WATER_EDGE_WIDTH, zoom))
 
+	def _calculate_bounds(self) -> Bounds:
+		x = self.pos.x
+		return x - self.width / 2, self.height, x + self.width / 2, self.height
+
 	@property
 	def width(self) -> float:
 		return self._dict["m_Width"]
 	@width.setter
 	def width(self, value: float):
-		self._dict["m_Width"] = value
+		with self._recording("m_Width"):
+			self._dict["m_Width"] = value
+		self._changed()
 
 	@property
 	def height(self) -> float:
 		return self._dict["m_Height"]
 	@height.setter
 	def height(self, value: float):
-		self._dict["m_Height"] = value
+		with self._recording("m_Height"):
+			self._dict["m_Height"] = value
+		self._changed()
 
 
 class Platform(LayoutObject):
@@ -269,26 +548,38 @@ class Platform(LayoutObject):
 		# Platform
 		pygame.draw.line(display, PLATFORM_COLOR_1, start, end, thickness)
 
+	def _calculate_bounds(self) -> Bounds:
+		pos = self.pos
+		legs_y = pos.y + self.height * (1 if self.flipped else -1)
+		return (pos.x - self.width / 2 - PLATFORM_THICKNESS, min(pos.y, legs_y) - PLATFORM_THICKNESS,
+		        pos.x + self.width / 2 + PLATFORM_THICKNESS, max(pos.y, legs_y) + PLATFORM_THICKNESS)
+
 	@property
 	def width(self) -> float:
 		return self._dict["m_Width"]
 	@width.setter
 	def width(self, value: float):
-		self._dict["m_Width"] = value
+		with self._recording("m_Width"):
+			self._dict["m_Width"] = value
+		self._changed()
 
 	@property
 	def height(self) -> float:
 		return self._dict["m_Height"]
 	@height.setter
 	def height(self, value: float):
-		self._dict["m_Height"] = value
+		with self._recording("m_Height"):
+			self._dict["m_Height"] = value
+		self._changed()
 
 	@property
 	def flipped(self) -> bool:
 		return self._dict["m_Flipped"]
 	@flipped.setter
 	def flipped(self, value: bool):
-		self._dict["m_Flipped"] = value
+		with self._recording("m_Flipped"):
+			self._dict["m_Flipped"] = value
+		self._changed()
 
 
 class Ramp(LayoutObject):
@@ -299,48 +590,61 @@ class Ramp(LayoutObject):
 
 	def render(self, display: Surface, camera: Vector, zoom: int, args=None):
 		points = self.points
+		points_pixels = (zoom * (points + camera).flip_y()).round().tolist()
 		thickness = round(zoom * PLATFORM_THICKNESS)
 		# Legs
-		width = points[-1].x - points[0].x
+		points_x = points.x.tolist()
+		width = points_x[-1] - points_x[0]
 		if not self.hide_legs and abs(width) > 0.01:
-			base_y = min(p.y for p in points) - self.leg_height - PLATFORM_THICKNESS
+			base_y = points.y.min() - self.leg_height - PLATFORM_THICKNESS
+			base_y_pixels = round(-zoom * (base_y + camera.y))
 			leg_separation = width / (width // RAMP_MAX_LEG_SEPARATION)
 			last_leg_x = 1000
-			for i in range(len(points)):
-				current = points[i]
-				if abs(current.x - last_leg_x) >= leg_separation or i == len(points) - 1:
-					last_leg_x = current.x
-					leg_a = (zoom * (points[i] + camera).flip_y()).round()
-					leg_b = Vector(leg_a.x, -zoom * (base_y + camera.y)).round()
-					if abs(leg_a.y - leg_b.y) > thickness * 1.5:
+			for i in range(len(points_x)):
+				if abs(points_x[i] - last_leg_x) >= leg_separation or i == len(points_x) - 1:
+					last_leg_x = points_x[i]
+					leg_a = points_pixels[i]
+					leg_b = (leg_a[0], base_y_pixels)
+					if abs(leg_a[1] - leg_b[1]) > thickness * 1.5:
 						pygame.draw.line(display, PLATFORM_COLOR_2, leg_a, leg_b, thickness)
 		# Ramp
-		for i in range(len(points) - 1):
-			point_a = (zoom * (points[i] + camera).flip_y()).round()
-			point_b = (zoom * (points[i+1] + camera).flip_y()).round()
+		for i in range(len(points_pixels) - 1):
 			# We don't know how to make it antialiased
-			pygame.draw.line(display, PLATFORM_COLOR_1, point_a, point_b, thickness)
+			pygame.draw.line(display, PLATFORM_COLOR_1, points_pixels[i], points_pixels[i+1], thickness)
+
+	def _calculate_bounds(self) -> Bounds:
+		(left, bottom), (right, top) = self.points.bounds()
+		if not self.hide_legs:
+			bottom -= self.leg_height + PLATFORM_THICKNESS
+		return (left - PLATFORM_THICKNESS, bottom - PLATFORM_THICKNESS,
+		        right + PLATFORM_THICKNESS, top + PLATFORM_THICKNESS)
 
 	@property
-	def points(self) -> Tuple[Vector, ...]:
-		return tuple(Vector(p) for p in self._dict["m_LinePoints"])
+	def points(self) -> PointArray:
+		return PointArray.from_dicts(self._dict["m_LinePoints"])
 	@points.setter
-	def points(self, values: Sequence[Vector]):
-		self._dict["m_LinePoints"] = [p.to_dict() for p in values]
+	def points(self, values: Union[PointArray, Sequence[Vector]]):
+		with self._recording("m_LinePoints"):
+			self._dict["m_LinePoints"] = PointArray(values, 2).to_dicts()
+		self._changed()
 
 	@property
 	def leg_height(self) -> float:
 		return self._dict["m_Height"]
 	@leg_height.setter
 	def leg_height(self, value: float):
-		self._dict["m_Height"] = value
+		with self._recording("m_Height"):
+			self._dict["m_Height"] = value
+		self._changed()
 
 	@property
 	def hide_legs(self) -> bool:
 		return self._dict["m_HideLegs"]
 	@hide_legs.setter
 	def hide_legs(self, value: bool):
-		self._dict["m_HideLegs"] = value
+		with self._recording("m_HideLegs"):
+			self._dict["m_HideLegs"] = value
+		self._changed()
 
 
 class Pillar(SelectableObject):
@@ -375,12 +679,18 @@ class Pillar(SelectableObject):
 	def colliderect(self, rect, mask=None):
 		return self.rect.colliderect(rect)
 
+	def _calculate_bounds(self) -> Bounds:
+		pos = self.pos
+		return pos.x - PILLAR_WIDTH / 2, pos.y, pos.x + PILLAR_WIDTH / 2, pos.y + self.height
+
 	@property
 	def height(self) -> float:
 		return self._dict["m_Height"]
 	@height.setter
 	def height(self, value: float):
-		self._dict["m_Height"] = value
+		with self._recording("m_Height"):
+			self._dict["m_Height"] = value
+		self._changed()
 
 
 class ShapeRenderArgs:
@@ -398,74 +708,174 @@ class ShapeRenderArgs:
 
 class CustomShape(SelectableObject):
 	list_name = "m_CustomShapes"
-
-	def __init__(self, dictionary: dict, anchors: Sequence[Anchor] = None):
+	points_cache_hits = 0
+	points_cache_misses = 0
+	sprite_cache = SpriteCache()
+	# Moving a shape only reports its old and new position under this key, instead of copying its static pins too.
+	# Restoring a position under it moves the static pins along with the shape.
+	MOVE_KEY = "m_Pos+m_StaticPins"
+
+	def __init__(self, dictionary: dict, anchors: Mapping[str, Anchor] = None):
 		super().__init__(dictionary)
+		self._points_version = -1
+		self._points_shape_version = -1
+		self._transform = np.identity(3)
+		self._transform_version = -1
+		self._rotations = Vector(0, 0, 0)
+		self._rotations_version = -1
+		self._points: Optional[PointArray] = None
+		self._points_bounds: Tuple[Vector, Vector] = (Vector(), Vector())
+		self._world_points: Optional[PointArray] = None
+		self._world_points_bounds: Tuple[Vector, Vector] = (Vector(), Vector())
+		self._shape_version = 0  # like the version, but moving the shape doesn't change it
 		self.bounding_box = Rect(0, 0, 0, 0)
 		self.point_hitboxes: List[CustomShapePoint] = []
 		self.anchors: List[Anchor] = []
 		self.selected_point_index: Optional[int] = None
+		self._hitbox_outdated = False
 		self.add_point_closest: ClosestPoint = (Vector(), 0, 0)
 		self.add_point_hitbox = Rect(0, 0, 0, 0)
 		if anchors:
-			for dyn_anc_id in self.dynamic_anchor_ids:
-				for anchor in anchors:
-					if anchor.id == dyn_anc_id:
-						self.anchors.append(anchor)
-		self.calculate_hitbox()
+			self.anchors = [anchors[i] for i in self.dynamic_anchor_ids if i in anchors]
+
+	@classmethod
+	def points_cache_info(cls) -> Tuple[int, int]:
+		"""Returns how many times the transformed points of any shape were reused (hits) and recalculated (misses)"""
+		return cls.points_cache_hits, cls.points_cache_misses
+
+	def _update_points(self):
+		"""Recalculates the transformed points if the geometry changed since they were last calculated"""
+		if self._points_version == self._version:
+			CustomShape.points_cache_hits += 1
+			return
+		CustomShape.points_cache_misses += 1
+		if self._points_shape_version != self._shape_version:
+			self._points = PointArray.from_dicts(self._dict["m_PointsLocalSpace"]).transform(self.transform[:2, :2])
+			self._points_bounds = self._points.bounds()
+			self._points_shape_version = self._shape_version
+		# When the shape was only moved, the points relative to its position are the same
+		x, y = self._dict["m_Pos"]["x"], self._dict["m_Pos"]["y"]
+		self._world_points = PointArray(self._points.array + (x, y))
+		(left, bottom), (right, top) = self._points_bounds
+		self._world_points_bounds = Vector(left + x, bottom + y), Vector(right + x, top + y)
+		self._points.array.flags.writeable = False
+		self._world_points.array.flags.writeable = False
+		self._points_version = self._version
+
+	def _calculate_bounds(self) -> Bounds:
+		self._update_points()
+		(left, bottom), (right, top) = self._world_points_bounds
+		if pins := self.static_pins:
+			xs, ys = [pin["x"] for pin in pins], [pin["y"] for pin in pins]
+			left, bottom = min(left, min(xs) - PIN_RADIUS), min(bottom, min(ys) - PIN_RADIUS)
+			right, top = max(right, max(xs) + PIN_RADIUS), max(top, max(ys) + PIN_RADIUS)
+		return left, bottom, right, top
 
 	def calculate_hitbox(self, align_center=False):
+		"""Moves the shape's position to the center of its points if align_center is true,
+		and remakes the hitbox mask if masks are used for collisions"""
 		points_base = self.points
 		# Calculate bounding rect
-		leftmost, rightmost, topmost, bottommost = 1000, -1000, 1000, -1000
-		for point in points_base:
-			leftmost = min(leftmost, point.x)
-			rightmost = max(rightmost, point.x)
-			topmost = min(topmost, point.y)
-			bottommost = max(bottommost, point.y)
+		(leftmost, topmost), (rightmost, bottommost) = points_base.bounds()
 		width, height = rightmost - leftmost, bottommost - topmost
 
 		# Adjust center
 		basepos = self.pos[:2]
 		center = Vector(leftmost + width / 2 + basepos.x, topmost + height / 2 + basepos.y)
 		if align_center:
-			center.to_dict(self._dict["m_Pos"])
-			self.points = (points_base := [point + basepos - center for point in points_base])
+			with self._recording("m_Pos"):
+				center.to_dict(self._dict["m_Pos"])
+			self.points = (points_base := points_base + basepos - center)
 			leftmost, rightmost = [x + basepos.x - center.x for x in (leftmost, rightmost)]
 			topmost, bottommost = [y + basepos.y - center.y for y in (topmost, bottommost)]
 			self._center_offset = (0, 0)
 		else:
-			self._center_offset = basepos - center
+			self._center_offset = (basepos - center).flip_y()
+		self._hitbox = self._make_hitbox_mask() if HITBOX_BACKEND == HITBOX_MASK else None
+		self._hitbox_outdated = False
 
-		# Create hitbox bitmap
-		offset = (- leftmost, topmost)
-		points_hitbox = [(HITBOX_RESOLUTION * (point + offset).flip_y()).round() for point in points_base]
-		surface = Surface((HITBOX_RESOLUTION * width + 1, HITBOX_RESOLUTION * height + 1), pygame.SRCALPHA, 32)
+	def _make_hitbox_mask(self) -> Mask:
+		"""Draws the shape on a bitmap with HITBOX_RESOLUTION pixels per unit, with its top left corner at (0, 0)"""
+		points = self.points
+		(left, bottom), (right, top) = points.bounds()
+		points_hitbox = (HITBOX_RESOLUTION * (points - (left, top)).flip_y()).round().tolist()
+		surface = Surface((HITBOX_RESOLUTION * (right - left) + 1, HITBOX_RESOLUTION * (top - bottom) + 1),
+		                  pygame.SRCALPHA, 32)
 		pygame.draw.polygon(surface, BLACK, points_hitbox)
-		self._hitbox = mask_from_surface(surface)
+		return mask_from_surface(surface)
+
+	def _use_mask(self) -> bool:
+		"""Whether collisions are checked with the hitbox mask. While a point is being moved, the mask is outdated
+		and the polygon is checked directly instead."""
+		if HITBOX_BACKEND != HITBOX_MASK or self._hitbox_outdated:
+			return False
+		if self._hitbox is None:  # the hitbox wasn't calculated yet, or masks weren't being used then
+			self.calculate_hitbox()
+		return True
+
+	def collidepoint(self, point: Sequence[Number]) -> bool:
+		if self._use_mask():
+			return super().collidepoint(point)
+		pos = (Vector(point[:2]) / self._last_zoom).flip_y() - self._last_camera
+		return overlaps(self.world_bounds, (pos.x, pos.y, pos.x, pos.y)) and point_in_polygon(pos, self.world_points)
+
+	def colliderect(self, rect: Sequence[Number], mask: Mask = None) -> bool:
+		if self._use_mask():
+			return super().colliderect(rect, mask)
+		(left, top), (right, bottom) = [(Vector(p) / self._last_zoom).flip_y() - self._last_camera
+		                                for p in (rect[:2], (rect[0] + rect[2], rect[1] + rect[3]))]
+		bounds = (left, bottom, right, top)
+		return overlaps(self.world_bounds, bounds) and polygon_overlaps_rect(self.world_points, bounds)
+
+	def start_moving_point(self, index: int):
+		"""Makes one of the shape's points follow the mouse. Until stop_moving_point is called, the hitbox isn't
+		remade and the shape isn't re-centered, as that is too slow to do every frame for large shapes."""
+		self.selected_point_index = index
+
+	def stop_moving_point(self):
+		"""Lets go of the point being moved, then remakes the hitbox and re-centers the shape if it changed"""
+		self.selected_point_index = None
+		if self._hitbox_outdated:
+			self.calculate_hitbox(True)
+
+	def _restore(self, key: str, value):
+		if key == CustomShape.MOVE_KEY:
+			pos = self._dict["m_Pos"]
+			self._move_pins(affine_matrix((value["x"] - pos["x"], value["y"] - pos["y"])))
+			super()._restore("m_Pos", value)
+			return
+		self._shape_version += 1
+		self._hitbox = None  # remade when it's next needed
+		super()._restore(key, value)
 
 	def render(self, display: Surface, camera: Vector, zoom: int, args: ShapeRenderArgs = None):
 		"""Draws the shape on the screen and calculates attributes like bounding_box.
 		It also searches for a single point to be selected, which is saved to the args object."""
 		super().render(display, camera, zoom)
-		basepos = self.pos[:2]
-		points_pixels = [zoom * (point + basepos + camera).flip_y() for point in self.points]
-		border_color = tuple(self.color[i] * 0.75 for i in range(3))
-		pygame.gfxdraw.filled_polygon(display, points_pixels, self.color)
-		pygame.gfxdraw.aapolygon(display, points_pixels, border_color)
-
-		for pin in self.static_pins:
-			p = (zoom * (Vector(pin) + camera).flip_y()).round()
-			pygame.gfxdraw.aacircle(display, p.x, p.y, round(zoom * PIN_RADIUS), STATIC_PIN_COLOR)
-			pygame.gfxdraw.filled_circle(display, p.x, p.y, round(zoom * PIN_RADIUS), STATIC_PIN_COLOR)
+		# A shape whose point is being moved changes every frame, so it's not worth caching
+		sprite = self.sprite(zoom) if self.selected_point_index is None else None
+		# The points on the screen are only needed if they're drawn directly
+		if sprite is None or self.selected or args.draw_points:
+			pixels = zoom * (self.world_points + camera).flip_y()
+		if sprite is None:  # too big to keep in memory
+			self._draw(display, pixels, zoom * (PointArray.from_dicts(self.static_pins) + camera).flip_y(), zoom)
+		else:
+			surface, (x, y) = sprite
+			pos = self.pos
+			display.blit(surface, (x + round(zoom * (pos.x + camera.x)), y - round(zoom * (pos.y + camera.y))))
 
 		if self.selected:
 			# We don't know how to make it antialiased
-			pygame.draw.polygon(display, HIGHLIGHT_COLOR, points_pixels, scale(SHAPE_HIGHLIGHTED_WIDTH, zoom, 60))
+			pygame.draw.polygon(display, HIGHLIGHT_COLOR, pixels.tolist(), scale(SHAPE_HIGHLIGHTED_WIDTH, zoom, 60))
 
 		self.point_hitboxes = []
 		self.add_point_hitbox = None
-		self.bounding_box = pygame.draw.polygon(DUMMY_SURFACE, WHITE, points_pixels)
+		self._update_points()
+		(min_x, min_y), (max_x, max_y) = self._world_points_bounds
+		left, top = zoom * (min_x + camera.x), zoom * -(max_y + camera.y)
+		right, bottom = zoom * (max_x + camera.x), zoom * -(min_y + camera.y)
+		self.bounding_box = Rect(math.floor(left), math.floor(top),
+		                         math.floor(right) - math.floor(left) + 1, math.floor(bottom) - math.floor(top) + 1)
 
 		if args.draw_points:
 			max_radius = round(zoom * POINT_SELECTED_RADIUS)
@@ -473,7 +883,7 @@ class CustomShape(SelectableObject):
 			self.bounding_box.top -= max_radius
 			self.bounding_box.width += max_radius * 2
 			self.bounding_box.height += max_radius * 2
-			for i, p in enumerate(points_pixels):
+			for i, p in enumerate(pixels):
 				self.point_hitboxes.append(CustomShapePoint(p, i, round(zoom * POINT_SELECTED_RADIUS)))
 			for i, point in enumerate(self.point_hitboxes):
 				if i == self.selected_point_index:
@@ -491,22 +901,69 @@ class CustomShape(SelectableObject):
 			center_end = center_start + (center_width, 0)
 			pygame.draw.line(display, HITBOX_COLOR, center_start, center_end, center_width)
 
+	def _draw(self, surface: Surface, pixels: PointArray, pins_pixels: PointArray, zoom: int):
+		"""Draws the filled shape and its static pins at the given pixel coordinates"""
+		color = self.color
+		border_color = tuple(color[i] * 0.75 for i in range(3))
+		points_pixels = pixels.tolist()
+		pygame.gfxdraw.filled_polygon(surface, points_pixels, color)
+		pygame.gfxdraw.aapolygon(surface, points_pixels, border_color)
+		pin_radius = round(zoom * PIN_RADIUS)
+		for x, y in pins_pixels.round().tolist():
+			pygame.gfxdraw.aacircle(surface, x, y, pin_radius, STATIC_PIN_COLOR)
+			pygame.gfxdraw.filled_circle(surface, x, y, pin_radius, STATIC_PIN_COLOR)
+
+	def sprite(self, zoom: int) -> Optional[Tuple[Surface, Tuple[int, int]]]:
+		"""Returns the shape and its static pins drawn on a transparent surface at the given zoom, along with where
+		to draw it in pixels relative to the shape's position. It's cached until the shape changes other than moving,
+		or until the color or the zoom change. Returns None if the surface would be too large to cache."""
+		key = (self._shape_version, zoom, tuple(self.color))
+		if (sprite := CustomShape.sprite_cache.get(self, key)) is not None:
+			return sprite
+		pixels = zoom * self.points.flip_y()
+		pins_pixels = zoom * (PointArray.from_dicts(self.static_pins) - self.pos[:2]).flip_y()
+		margin = round(zoom * PIN_RADIUS) + 2
+		(left, top), (right, bottom) = pixels.bounds()
+		if len(pins_pixels):
+			(pins_left, pins_top), (pins_right, pins_bottom) = pins_pixels.bounds()
+			left, top = min(left, pins_left), min(top, pins_top)
+			right, bottom = max(right, pins_right), max(bottom, pins_bottom)
+		origin = (math.floor(left) - margin, math.floor(top) - margin)
+		width, height = math.ceil(right) + margin - origin[0] + 1, math.ceil(bottom) + margin - origin[1] + 1
+		if not CustomShape.sprite_cache.fits(width, height):
+			return None
+		# Drawing straight onto a transparent surface doesn't blend the antialiased edges like the screen would.
+		# Instead it's drawn over black and over white, and the transparency is how much the two differ.
+		on_black, on_white = Surface((width, height)), Surface((width, height))
+		on_white.fill(WHITE)
+		for background in (on_black, on_white):
+			self._draw(background, pixels - origin, pins_pixels - origin, zoom)
+		black = pygame.surfarray.array3d(on_black).astype(np.float64)
+		alpha = 255 - (pygame.surfarray.array3d(on_white) - black).max(axis=2)
+		surface = Surface((width, height), pygame.SRCALPHA, 32)
+		pygame.surfarray.pixels3d(surface)[...] = np.minimum(255, np.rint(
+			black * 255 / np.maximum(alpha, 1)[..., np.newaxis]))
+		pygame.surfarray.pixels_alpha(surface)[...] = alpha
+		if pygame.display.get_surface() is not None:
+			surface = surface.convert_alpha()
+		CustomShape.sprite_cache.put(self, key, surface, origin)
+		return surface, origin
+
 	def render_points(self, display: Surface, camera: Vector, zoom: int, args: ShapeRenderArgs):
 		"""Draws dots for the shape's points and performs operations related to selecting and moving them.
 		It also searches for the top point to display, which is saved to the args object."""
 		if not args.draw_points:
 			return
-		points, basepos = self.points, self.pos[:2]
-		points_pixels = [zoom * (point + basepos + camera).flip_y() for point in self.points]
+		points = self.points
+		points_pixels = (zoom * (self.world_points + camera).flip_y()).tolist()
 
 		# Move point if a point is selected
-		for i in range(len(points)):
-			if i == self.selected_point_index:
-				newpoints = list(points)
-				newpoints[i] += args.mouse_change
-				points = newpoints
-				self.points = tuple(newpoints)
-				break
+		if (self.selected_point_index is not None and self.selected_point_index < len(points)
+				and any(args.mouse_change[:2])):
+			points = PointArray(points.array.copy())
+			points.array[self.selected_point_index] += args.mouse_change[:2]
+			self.points = points
+			self._hitbox_outdated = True
 		# Render points
 		for point in self.point_hitboxes:
 			if point == args.selected_point or args.selected_point is None and args.moused_over_point == point:
@@ -532,49 +989,81 @@ class CustomShape(SelectableObject):
 					display, closest[0].x, closest[0].y, round(zoom * PIN_RADIUS / 1.7), ADD_POINT_COLOR)
 				pygame.gfxdraw.filled_circle(
 					display, closest[0].x, closest[0].y, round(zoom * PIN_RADIUS / 1.7), ADD_POINT_COLOR)
-		# Update hitbox and move center to actual center
-		if self.selected_point_index is not None:
-			self.calculate_hitbox(True)
 
 	def add_point(self, index: int, point: Vector):
-		points = list(self.points)
-		points.insert(index, (point / self._last_zoom).flip_y() - self._last_camera - self.pos)
-		self.points = points
+		point = (point / self._last_zoom).flip_y() - self._last_camera - self.pos
+		self.points = PointArray(np.insert(self.points.array, index, point[:2], axis=0))
 		self.selected_point_index = None
 		self.calculate_hitbox(True)
 
 	def del_point(self, index: int):
-		points = list(self.points)
-		points.pop(index)
-		self.points = points
+		self.points = PointArray(np.delete(self.points.array, index, axis=0))
 		self.selected_point_index = None
 		self.calculate_hitbox(True)
 
+	@property
+	def transform(self) -> np.ndarray:
+		"""The 3x3 affine matrix from the shape's local space to world space, which scales, flips, rotates and then
+		moves points. It's cached until the shape changes, and is read-only."""
+		if self._transform_version != self._version:
+			self._transform = self._calculate_transform()
+			self._transform.flags.writeable = False
+			self._transform_version = self._version
+		return self._transform
+
+	def _calculate_transform(self) -> np.ndarray:
+		pos, scale = self._dict["m_Pos"], self._dict["m_Scale"]
+		return affine_matrix((pos["x"], pos["y"]), (scale["x"], scale["y"]), self._dict["m_Flipped"],
+		                     self._dict["m_RotationDegrees"])
+
+	def _move_pins(self, matrix: np.ndarray):
+		"""Maps the static pins through an affine matrix in a single multiplication"""
+		pins = self.static_pins
+		if pins:
+			for pin, (x, y) in zip(pins, PointArray.from_dicts(pins).transform(matrix).tolist()):
+				pin["x"], pin["y"] = x, y
+
+	def _move_attached(self, matrix: np.ndarray):
+		"""Maps the static pins and dynamic anchors through an affine matrix, each group in a single multiplication"""
+		self._move_pins(matrix)
+		if self.anchors:
+			anchor_points = PointArray.from_dicts([anchor.dictionary["m_Pos"] for anchor in self.anchors])
+			for anchor, point in zip(self.anchors, anchor_points.transform(matrix)):
+				anchor.pos = point
+
+	def _follow_transform(self, old: np.ndarray):
+		"""Moves the static pins and dynamic anchors from where an old transform put them to where the current one does"""
+		self._move_attached(self._calculate_transform() @ np.linalg.inv(old))
+
 	@SelectableObject.pos.setter
 	def pos(self, value: Vector):
 		change = value - self.pos
-		SelectableObject.pos.__set__(self, value)
-		for pin in self.static_pins:
-			(Vector(pin) + change).to_dict(pin)
-		for anchor in self.anchors:
-			anchor.pos += change
+		old_values = self._snapshot(("m_Pos",))
+		value.to_dict(self._dict["m_Pos"])
+		self._move_attached(affine_matrix(change[:2]))
+		if old_values is not None and old_values[0] != self._dict["m_Pos"]:
+			new = snapshot_layout(self._dict["m_Pos"])
+			for callback in self._listeners:
+				callback(self, CustomShape.MOVE_KEY, old_values[0], new)
+		self._changed()
 
 	@property
 	def rotations(self) -> Vector:
-		"""Rotation degrees in the X, Y, and Z axis, calculated from a quaternion"""
-		return Vector(self._dict["m_Rot"]).euler_angles()
+		"""Rotation degrees in the X, Y, and Z axis, calculated from a quaternion and cached until the shape changes"""
+		if self._rotations_version != self._version:
+			self._rotations = Vector(self._dict["m_Rot"]).euler_angles()
+			self._rotations_version = self._version
+		return self._rotations
 	@rotations.setter
 	def rotations(self, values: Vector):
-		old_rotz = self.rotation
-		values.quaternion().to_dict(self._dict["m_Rot"])
-		self._dict["m_RotationDegrees"] = values[2]
-		change = self.rotation - old_rotz
-		if abs(change) > 0.000001:
-			basepos = self.pos[:2]
-			for pin in self.static_pins:
-				Vector(pin).rotate(change, basepos).to_dict(pin)
-			for anchor in self.anchors:
-				anchor.pos = anchor.pos.rotate(change, basepos)
+		old_rotz, old_transform = self.rotation, self._calculate_transform()
+		with self._recording("m_Rot", "m_RotationDegrees", "m_StaticPins"):
+			values.quaternion().to_dict(self._dict["m_Rot"])
+			self._dict["m_RotationDegrees"] = values[2]
+			if abs(self.rotation - old_rotz) > 0.000001:
+				self._follow_transform(old_transform)
+		self._shape_version += 1
+		self._changed()
 
 	@property
 	def rotation(self) -> float:
@@ -583,72 +1072,85 @@ class CustomShape(SelectableObject):
 	@rotation.setter
 	def rotation(self, value: float):
 		x, y, _ = self.rotations
-		self.rotations = (x, y, value)
+		self.rotations = Vector(x, y, value)
 
 	@property
 	def flipped(self) -> bool:
 		return self._dict["m_Flipped"]
 	@flipped.setter
 	def flipped(self, value: bool):
-		old_flipped = self._dict["m_Flipped"]
-		self._dict["m_Flipped"] = value
-		if old_flipped != value:
-			basepos = self.pos[:2]
-			for pin in self.static_pins:
-				Vector(pin).flip(basepos, self.rotation).to_dict(pin)
-			for anchor in self.anchors:
-				anchor.pos = anchor.pos.flip(basepos, self.rotation)
+		old_flipped, old_transform = self._dict["m_Flipped"], self._calculate_transform()
+		with self._recording("m_Flipped", "m_StaticPins"):
+			self._dict["m_Flipped"] = value
+			if old_flipped != value:
+				self._follow_transform(old_transform)
+		self._shape_version += 1
+		self._changed()
 
 	@property
 	def scale(self) -> Vector:
 		return Vector(self._dict["m_Scale"])
 	@scale.setter
 	def scale(self, value: Vector):
-		old_scale = self.scale
-		value.to_dict(self._dict["m_Scale"])
-		change = (value / old_scale)[:2]
-		if abs(change.x - 1) > 0.000001 or abs(change.y - 1) > 0.000001:
-			basepos, rot = self.pos[:2], self.rotation
-			for pin in self.static_pins:
-				((Vector(pin).rotate(-rot, basepos) - basepos) * change + basepos).rotate(rot, basepos).to_dict(pin)
-			for anchor in self.anchors:
-				anchor.pos = ((anchor.pos.rotate(-rot, basepos) - basepos) * change + basepos).rotate(rot, basepos)
+		old_scale, old_transform = self.scale, self._calculate_transform()
+		with self._recording("m_Scale", "m_StaticPins"):
+			value.to_dict(self._dict["m_Scale"])
+			change = (value / old_scale)[:2]
+			if abs(change.x - 1) > 0.000001 or abs(change.y - 1) > 0.000001:
+				self._follow_transform(old_transform)
+		self._shape_version += 1
+		self._changed()
 
 	@property
 	def color(self) -> Vector:
 		return Vector(round(v*255) for v in self._dict["m_Color"].values())
 	@color.setter
 	def color(self, value: Vector):
-		if len(value) == 3:
-			self._dict["m_Color"] = {"r": value[0] / 255, "g": value[1] / 255, "b": value[2] / 255,
-			                         "a": self._dict["m_Color"]["a"]}
-		else:
-			self._dict["m_Color"] = {"r": value[0]/255, "g": value[1]/255, "b": value[2]/255, "a": value[3]/255}
+		with self._recording("m_Color"):
+			if len(value) == 3:
+				self._dict["m_Color"] = {"r": value[0] / 255, "g": value[1] / 255, "b": value[2] / 255,
+				                         "a": self._dict["m_Color"]["a"]}
+			else:
+				self._dict["m_Color"] = {"r": value[0]/255, "g": value[1]/255, "b": value[2]/255, "a": value[3]/255}
+		self._notify()
 
 	@property
-	def points(self) -> Tuple[Vector, ...]:
-		pts_scale = self.scale
-		values = self._dict["m_PointsLocalSpace"]
-		return tuple((Vector(p) * pts_scale).flip_x(only_if=self.flipped).rotate(self.rotation) for p in values)
+	def points(self) -> PointArray:
+		"""The shape's points after scaling, flipping and rotating, relative to its position.
+		The result is cached until the geometry changes, and its array is read-only."""
+		self._update_points()
+		return self._points
 	@points.setter
-	def points(self, values: Sequence[Vector]):
-		pts_scale = self.scale
-		pts = [(p.rotate(-self.rotation).flip_x(only_if=self.flipped) / pts_scale).to_dict() for p in values]
-		self._dict["m_PointsLocalSpace"] = pts
+	def points(self, values: Union[PointArray, Sequence[Vector]]):
+		points = PointArray(values, 2).transform(np.linalg.inv(self.transform[:2, :2]))
+		with self._recording("m_PointsLocalSpace"):
+			self._dict["m_PointsLocalSpace"] = points.to_dicts()
+		self._shape_version += 1
+		self._changed()
+
+	@property
+	def world_points(self) -> PointArray:
+		"""The shape's points in world space. The result is cached until the geometry changes, and is read-only."""
+		self._update_points()
+		return self._world_points
 
 	@property
 	def static_pins(self) -> List[Dict[str, float]]:
 		return self._dict["m_StaticPins"]
 	@static_pins.setter
 	def static_pins(self, values: List[Dict[str, float]]):
-		self._dict["m_StaticPins"] = values
+		with self._recording("m_StaticPins"):
+			self._dict["m_StaticPins"] = values
+		self._shape_version += 1
+		self._changed()
 
 	@property
 	def dynamic_anchor_ids(self) -> List[str]:
 		return self._dict["m_DynamicAnchorGuids"]
 	@dynamic_anchor_ids.setter
 	def dynamic_anchor_ids(self, values: List[str]):
-		self._dict["m_DynamicAnchorGuids"] = values
+		with self._renaming(), self._recording("m_DynamicAnchorGuids"):
+			self._dict["m_DynamicAnchorGuids"] = values
 
 
 class CustomShapePoint:
@@ -670,8 +1172,21 @@ class CustomShapePoint:
 
 
 class Bridge:
-	def __init__(self, layout: dict):
+	"""Wraps the bridge in a layout. Its joints and edges are kept in arrays indexed by joint, which are built once
+	and then only rebuilt when joints, anchors or edges are added or removed.
+	If a GUID registry is given, the joints are kept in it."""
+	def __init__(self, layout: dict, registry: GuidRegistry = None):
 		self._dict = layout["m_Bridge"]
+		self._registry = registry
+		if registry is not None:
+			registry.set_joints(self._dict["m_BridgeJoints"])
+		self._graph_key = None
+		self._indices: Dict[str, int] = {}
+		self._positions = np.zeros((0, 2))
+		self._joint_count = 0
+		self._edges = np.zeros((0, 3), dtype=np.int64)
+		self._edge_bounds = np.zeros((0, 4))
+		self._joint_edges: List[np.ndarray] = []
 
 	@property
 	def dictionary(self) -> dict:
@@ -699,23 +1214,113 @@ class Bridge:
 		"""The raw list of piece dictionaries"""
 		return self._dict["m_BridgeEdges"]
 
-	def render(self, display: Surface, camera: Vector, zoom: int, render_bridge=True):
+	def invalidate(self):
+		"""Makes the joint and edge arrays be rebuilt the next time they're used.
+		Needed after anchors are added or removed, or the same number of them are replaced."""
+		self._graph_key = None
+
+	def _update_graph(self):
+		"""Rebuilds the joint and edge arrays if the lists in the layout changed since they were built"""
+		lists = self._dict["m_BridgeJoints"], self._dict["m_Anchors"], self.pieces_raw
+		key = tuple((id(li), len(li)) for li in lists)
+		if key == self._graph_key:
+			return
+		self._graph_key = key
+		# Joints come first, followed by the anchors
+		all_joints = list(chain(lists[0], lists[1]))
+		self._indices = {j["m_Guid"]: i for i, j in enumerate(all_joints)}
+		if self._registry is not None:
+			self._registry.set_joints(lists[0])
+		self._positions = PointArray.from_dicts([j["m_Pos"] for j in all_joints]).array
+		self._joint_count = len(lists[0])
+		# Edges whose joints don't exist are left out, and the rest keep their order in the layout, which they're drawn in
+		indices = self._indices
+		edges = [(indices[p["m_NodeA_Guid"]], indices[p["m_NodeB_Guid"]], p["m_Material"])
+		         for p in lists[2] if p["m_NodeA_Guid"] in indices and p["m_NodeB_Guid"] in indices]
+		self._edges = np.array(edges, dtype=np.int64).reshape(-1, 3)
+		self._edge_bounds = self._calculate_edge_bounds(self._positions, self._edges)
+		# Which edges each joint is part of
+		ends = self._edges[:, :2].ravel()
+		order = np.argsort(ends, kind="stable")
+		splits = np.searchsorted(ends[order], np.arange(1, len(all_joints)))
+		self._joint_edges = np.split(order // 2, splits)
+
+	@staticmethod
+	def _calculate_edge_bounds(positions: np.ndarray, edges: np.ndarray) -> np.ndarray:
+		starts, ends = positions[edges[:, 0]], positions[edges[:, 1]]
+		widths = BridgePiece.widths_by_material
+		half_widths = np.fromiter((widths.get(material, BridgePiece.default_width) for material in edges[:, 2].tolist()),
+		                          np.float64, len(edges)).reshape(-1, 1) / 2
+		return np.hstack((np.minimum(starts, ends) - half_widths, np.maximum(starts, ends) + half_widths))
+
+	def update_joint(self, anchor: 'Anchor'):
+		"""Reads the position of a moved anchor again, updating the edges connected to it.
+		It can be used directly as an observer of the anchor."""
+		self._update_graph()
+		i = self._indices.get(anchor.id)
+		if i is None:
+			return
+		pos = anchor.pos
+		self._positions[i] = pos.x, pos.y
+		edges = self._joint_edges[i]
+		self._edge_bounds[edges] = self._calculate_edge_bounds(self._positions, self._edges[edges])
+
+	def update_joints(self, anchors: Iterable['Anchor']):
+		"""Like update_joint for many anchors at once, updating each edge connected to them a single time"""
+		self._update_graph()
+		indices, positions = [], []
+		for anchor in anchors:
+			if (i := self._indices.get(anchor.id)) is not None:
+				indices.append(i)
+				positions.append((anchor.dictionary["m_Pos"]["x"], anchor.dictionary["m_Pos"]["y"]))
+		if not indices:
+			return
+		self._positions[indices] = positions
+		edges = np.unique(np.concatenate([self._joint_edges[i] for i in indices]))
+		self._edge_bounds[edges] = self._calculate_edge_bounds(self._positions, self._edges[edges])
+
+	def joint_edges_bounds(self, *guids: str) -> Optional[Bounds]:
+		"""The world space bounds of all edges connected to some joints or anchors, or None if they have no edges"""
+		self._update_graph()
+		edges = [self._joint_edges[i] for guid in guids if (i := self._indices.get(guid)) is not None]
+		edges = np.concatenate(edges) if edges else ()
+		if not len(edges):
+			return None
+		bounds = self._edge_bounds[edges]
+		(left, bottom), (right, top) = bounds[:, :2].min(axis=0), bounds[:, 2:].max(axis=0)
+		return float(left), float(bottom), float(right), float(top)
+
+	@property
+	def edge_bounds(self) -> np.ndarray:
+		"""The world space bounds of each edge whose joints exist, as rows of (min x, min y, max x, max y)"""
+		self._update_graph()
+		return self._edge_bounds.copy()
+
+	def render(self, display: Surface, camera: Vector, zoom: int, render_bridge=True, view: Bounds = None):
+		"""Draws the bridge. If a view rectangle in world space is given, only edges and joints inside it are drawn"""
 		if not render_bridge:
 			return
-		for i, piece in enumerate(self.pieces):
-			try:
-				start = (zoom * (piece.start + camera).flip_y()).round()
-				end = (zoom * (piece.end + camera).flip_y()).round()
-			except KeyError:
-				pass
-			else:
-				# We don't know how to make it antialiased
-				pygame.draw.line(display, piece.color, start, end, max(1, round(zoom * piece.base_width)))
-		for joint in self.non_anchor_joints.values():
-			radius = round(zoom * JOINT_RADIUS)
-			pos = (zoom * (joint + camera).flip_y()).round()
-			pygame.gfxdraw.filled_circle(display, pos.x, pos.y, radius, JOINT_COLOR)
-			pygame.gfxdraw.aacircle(display, pos.x, pos.y, radius, JOINT_BORDER)
+		self._update_graph()
+		positions, edges = self._positions, self._edges
+		joints = positions[:self._joint_count]
+		if view is not None:
+			edges = edges[overlaps_many(self._edge_bounds, view)]
+			joints = joints[overlaps_many(np.hstack((joints - JOINT_RADIUS, joints + JOINT_RADIUS)), view)]
+		# All positions are transformed at once, and the width of each material is found once.
+		# Edges are drawn in the layout's order, so the same ones end up on top where they cross.
+		pixels = np.rint(zoom * (positions + (camera.x, camera.y)) * (1, -1)).astype(np.int64)
+		colors = BridgePiece.colors_by_material
+		widths = {material: max(1, round(zoom * width)) for material, width in BridgePiece.widths_by_material.items()}
+		default_color, default_width = BridgePiece.default_color, max(1, round(zoom * BridgePiece.default_width))
+		# We don't know how to make it antialiased
+		for start, end, material in zip(pixels[edges[:, 0]].tolist(), pixels[edges[:, 1]].tolist(),
+		                                edges[:, 2].tolist()):
+			pygame.draw.line(display, colors.get(material, default_color), start, end,
+			                 widths.get(material, default_width))
+		radius = round(zoom * JOINT_RADIUS)
+		for x, y in np.rint(zoom * (joints + (camera.x, camera.y)) * (1, -1)).astype(np.int64).tolist():
+			pygame.gfxdraw.filled_circle(display, x, y, radius, JOINT_COLOR)
+			pygame.gfxdraw.aacircle(display, x, y, radius, JOINT_BORDER)
 
 
 class BridgePiece:
@@ -737,6 +1342,11 @@ class BridgePiece:
 		0.14, 0.14, 0.08,
 		0.06, 0.14, 0.16
 	)
+	colors_by_material = {material: color for material, color in enumerate(material_colors) if color is not None}
+	widths_by_material = {material: width for material, width in enumerate(material_widths) if width is not None}
+	# Used for materials that aren't known, the width being the widest so that their bounds contain them
+	default_color = (0, 0, 0)
+	default_width = max(widths_by_material.values())
 
 	def __init__(self, dictionary: dict, joints: dict):
 		self._dict = dictionary
@@ -749,11 +1359,11 @@ class BridgePiece:
 
 	@property
 	def color(self) -> Tuple[int, int, int]:
-		return self.material_colors[self.material]
+		return self.colors_by_material.get(self.material, self.default_color)
 
 	@property
-	def base_width(self) -> int:
-		return self.material_widths[self.material]
+	def base_width(self) -> float:
+		return self.widths_by_material.get(self.material, self.default_width)
 
 	@property
 	def start_joint(self) -> str:
@@ -0,0 +1,173 @@
+"""A catalog of the levels in a folder, kept between launches so that only files that changed are read again"""
+import os
+import re
+import hashlib
+from os.path import abspath
+from typing import *
+
+import cache_files
+import layout_objects as lay
+from layout_io import read_layout
+from spatial_index import Bounds
+
+JSON_EXTENSION = ".layout.json"
+LAYOUT_EXTENSION = ".layout"
+BACKUP_EXTENSION = ".layout.backup"
+FILE_REGEX = re.compile(f"^(.+)({JSON_EXTENSION}|{LAYOUT_EXTENSION})$")
+
+CATALOG_VERSION = 1  # increase when the summary changes, so that old catalogs are read again
+OBJECT_TYPES = (lay.TerrainStretch, lay.WaterBlock, lay.Platform, lay.Ramp, lay.CustomShape, lay.Pillar, lay.Anchor)
+
+FileStat = Tuple[int, int]  # size in bytes, modification time in nanoseconds
+
+
+def summarize_layout(layout: dict) -> dict:
+	"""What the catalog knows about a level: how many objects of each type and bridge edges it has,
+	its budget, and the world space bounds of everything in it"""
+	counts = {cls.list_name: len(layout.get(cls.list_name, ())) for cls in OBJECT_TYPES}
+	bridge = layout.get("m_Bridge", {})
+	budget = layout.get("m_Budget")
+	if isinstance(budget, dict):
+		budget = budget.get("m_CashBudget")
+	bounds = []
+	for cls in OBJECT_TYPES:
+		if cls.list_name in layout:
+			bounds.extend(obj.world_bounds for obj in lay.LayoutList(cls, layout))
+	if bridge.get("m_BridgeEdges"):
+		bridge.setdefault("m_Anchors", layout.get("m_Anchors", []))
+		bounds.extend(lay.Bridge(layout).edge_bounds.tolist())
+	return {
+		"counts": counts,
+		"edges": len(bridge.get("m_BridgeEdges", ())),
+		"budget": budget if isinstance(budget, (int, float)) else None,
+		"bounds": [min(b[0] for b in bounds), min(b[1] for b in bounds),
+		           max(b[2] for b in bounds), max(b[3] for b in bounds)] if bounds else None,
+	}
+
+
+def list_level_files(folder: str) -> Dict[str, Dict[str, FileStat]]:
+	"""The stats of the level files in a folder, by level name and then by extension,
+	in the order the folder lists them"""
+	files = {}
+	with os.scandir(folder) as entries:
+		for entry in entries:
+			if not (match := FILE_REGEX.match(entry.name)) or not entry.is_file():
+				continue
+			stat = entry.stat()
+			files.setdefault(match.group(1), {})[match.group(2)] = (stat.st_size, stat.st_mtime_ns)
+	return files
+
+
+class LevelInfo:
+	"""A level in the folder, made of a .layout file, a .layout.json file, or both"""
+
+	def __init__(self, name: str, layout_stat: Optional[FileStat], json_stat: Optional[FileStat],
+	             summary: Optional[dict]):
+		self.name = name
+		self.layout_stat = layout_stat
+		self.json_stat = json_stat
+		self.summary = summary  # None when there is no valid .layout.json to read it from
+
+	@property
+	def layoutfile(self) -> str:
+		return self.name + LAYOUT_EXTENSION
+
+	@property
+	def jsonfile(self) -> str:
+		return self.name + JSON_EXTENSION
+
+	@property
+	def backupfile(self) -> str:
+		return self.name + BACKUP_EXTENSION
+
+	@property
+	def stale(self) -> bool:
+		"""Whether the .layout file has to be converted, as it's newer than the .layout.json or there isn't one"""
+		return self.layout_stat is not None and (self.json_stat is None or self.layout_stat[1] > self.json_stat[1])
+
+	@property
+	def counts(self) -> Dict[str, int]:
+		return self.summary["counts"] if self.summary else {}
+
+	@property
+	def edges(self) -> Optional[int]:
+		return self.summary["edges"] if self.summary else None
+
+	@property
+	def budget(self) -> Optional[float]:
+		return self.summary["budget"] if self.summary else None
+
+	@property
+	def bounds(self) -> Optional[Bounds]:
+		return tuple(self.summary["bounds"]) if self.summary and self.summary["bounds"] else None
+
+	def __str__(self):
+		"""How the level is shown in the level picker"""
+		if not self.summary:
+			return self.name
+		details = [f"{self.counts.get(lay.CustomShape.list_name, 0)} shapes", f"{self.edges} edges"]
+		if self.budget is not None:
+			details.append(f"${self.budget:,.0f}")
+		return f"{self.name}   ({', '.join(details)})"
+
+
+def list_levels(folder: str) -> List[LevelInfo]:
+	"""The levels in a folder, without reading them"""
+	return [LevelInfo(name, stats.get(LAYOUT_EXTENSION), stats.get(JSON_EXTENSION), None)
+	        for name, stats in list_level_files(folder).items()]
+
+
+class LevelCatalog:
+	"""The levels in a folder. Each one remembers the size and modification time of its files,
+	and a scan only reads the files that changed since it was last stored."""
+
+	def __init__(self, folder: str):
+		self.folder = abspath(folder)
+		self.cache_name = f"catalog_{hashlib.sha1(self.folder.encode()).hexdigest()[:16]}.json"
+		self.levels: Dict[str, LevelInfo] = {}
+		stored = cache_files.read_json(self.cache_name, {})
+		if isinstance(stored, dict) and stored.get("version") == CATALOG_VERSION:
+			for name, (layout_stat, json_stat, summary) in stored.get("levels", {}).items():
+				self.levels[name] = LevelInfo(name, layout_stat and tuple(layout_stat),
+				                              json_stat and tuple(json_stat), summary)
+		self.read_count = 0  # how many files the last scan had to read
+
+	def _summarize(self, info: LevelInfo) -> Optional[dict]:
+		try:
+			return summarize_layout(read_layout(os.path.join(self.folder, info.jsonfile)))
+		except Exception:  # not a level, or incomplete
+			return None
+
+	def scan(self) -> List[LevelInfo]:
+		"""Updates the catalog with the files in the folder and returns its levels. Only the .layout.json files
+		that were added or changed are read, and the catalog is stored again if anything changed."""
+		self.read_count = 0
+		files = list_level_files(self.folder)
+		changed = files.keys() != self.levels.keys()
+		levels = {}
+		for name, stats in files.items():
+			layout_stat, json_stat = stats.get(LAYOUT_EXTENSION), stats.get(JSON_EXTENSION)
+			info = self.levels.get(name)
+			if info is not None and info.json_stat == json_stat:
+				if info.layout_stat != layout_stat:
+					info.layout_stat, changed = layout_stat, True
+			else:
+				changed = True
+				info = LevelInfo(name, layout_stat, json_stat, None)
+				if json_stat is not None:
+					info.summary = self._summarize(info)
+					self.read_count += 1
+			levels[name] = info
+		self.levels = levels
+		if changed:
+			self.save()
+		return list(levels.values())
+
+	def save(self):
+		cache_files.write_json(self.cache_name, {
+			"version": CATALOG_VERSION,
+			"levels": {name: [info.layout_stat, info.json_stat, info.summary] for name, info in self.levels.items()},
+		})
+
+	def get(self, name: str) -> Optional[LevelInfo]:
+		return self.levels.get(name)
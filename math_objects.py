@@ -1,8 +1,10 @@
 import math
+import numpy as np
 from typing import *
 from itertools import zip_longest
 
 Number = Union[int, float]
+SCALAR_TYPES = (int, float, np.number)  # like numbers.Real and the scalars of numpy arrays, but faster to check
 
 
 def is_iterable(value):
@@ -13,6 +15,19 @@ def is_dict(value):
 	return hasattr(value, "items")
 
 
+def affine_matrix(pos: Sequence[Number] = (0, 0), scale: Sequence[Number] = (1, 1), flipped=False,
+                  angle: float = 0, deg=True) -> np.ndarray:
+	"""Returns the 3x3 matrix that scales 2D points, flips them horizontally if flipped is true,
+	rotates them counterclockwise by an angle and then moves them by pos, in that order"""
+	if deg:
+		angle = math.radians(angle)
+	cos, sin = math.cos(angle), math.sin(angle)
+	sx, sy = -scale[0] if flipped else scale[0], scale[1]
+	return np.array([[cos * sx, -sin * sy, pos[0]],
+	                 [sin * sx, cos * sy, pos[1]],
+	                 [0.0, 0.0, 1.0]])
+
+
 class Vector(Tuple[Number, ...]):
 	"""A tuple with useful element-wise operations as well as point operations"""
 
@@ -190,3 +205,374 @@ class Vector(Tuple[Number, ...]):
 				return Vector(l1[0], self[1]) if l1[1] <= self[1] <= l2[1] or l2[1] <= self[1] <= l1[1] else None
 			else:  # Horizontal Line
 				return Vector(self[0], l1[1]) if l1[0] <= self[0] <= l2[0] or l2[0] <= self[0] <= l1[0] else None
+
+
+class PointArray:
+	"""A contiguous array of N points of 2 or 3 dimensions, with vectorized versions of Vector's operations.
+	Meant for batches of points such as a shape's vertices, where building a Vector per point is too slow."""
+
+	__slots__ = ("array",)
+
+	def __init__(self, values: Union['PointArray', np.ndarray, Iterable[Sequence[Number]]], dims: int = None):
+		"""Create a new array from an (N, dims) ndarray or an iterable of points.
+		If the points have different sizes, they are all cut down to the smallest one."""
+		if isinstance(values, PointArray):
+			array = values.array
+		elif isinstance(values, np.ndarray):
+			array = values if values.ndim == 2 else values.reshape(-1, dims or 2)
+		else:
+			values = [tuple(v) for v in values]
+			if dims is None:
+				dims = min((len(v) for v in values), default=2)
+			array = np.array([v[:dims] for v in values], dtype=np.float64).reshape(-1, dims)
+		self.array: np.ndarray = array
+
+	@classmethod
+	def from_dicts(cls, dicts: Sequence[Dict[str, Number]], dims=2) -> 'PointArray':
+		"""Returns a new array from a list of dictionaries in the format {x, y(, z)}"""
+		keys = Vector._keys[:dims]
+		return cls(np.array([[d[k] for k in keys] for d in dicts], dtype=np.float64).reshape(-1, dims))
+
+	def to_dicts(self) -> List[Dict[str, Number]]:
+		"""Returns a list of dictionaries in the format {x, y(, z)}"""
+		keys = Vector._keys[:self.dims]
+		return [dict(zip(keys, p)) for p in self.array.tolist()]
+
+	def tolist(self) -> List[List[Number]]:
+		"""Returns the points as a list of lists, which pygame accepts as a list of coordinates"""
+		return self.array.tolist()
+
+	@property
+	def dims(self) -> int:
+		"""The number of values in each point"""
+		return self.array.shape[1]
+
+	@property
+	def x(self) -> np.ndarray:
+		return self.array[:, 0]
+
+	@property
+	def y(self) -> np.ndarray:
+		return self.array[:, 1]
+
+	def __len__(self) -> int:
+		return self.array.shape[0]
+
+	def __iter__(self) -> Iterator[Vector]:
+		return (Vector(p) for p in self.array.tolist())
+
+	def __getitem__(self, index: Union[int, slice]) -> Union[Vector, 'PointArray']:
+		if isinstance(index, slice):
+			return PointArray(self.array[index])
+		return Vector(self.array[index].tolist())
+
+	def __repr__(self):
+		return f"PointArray({self.array.tolist()})"
+
+	def _operand(self, other: Union[Number, Sequence[Number], 'PointArray'], fillvalue: Number):
+		"""Turns the other operand into something that broadcasts against this array.
+		Single points are cut or padded with the fill value to match this array's dimensions, like Vector does."""
+		if isinstance(other, PointArray):
+			return other.array
+		if isinstance(other, np.ndarray) or not is_iterable(other):
+			return other
+		values = tuple(other)[:self.dims]
+		return np.array(values + (fillvalue,) * (self.dims - len(values)), dtype=np.float64)
+
+	def __add__(self, other: Union[Sequence[Number], 'PointArray']) -> 'PointArray':
+		"""Element-wise addition"""
+		return PointArray(self.array + self._operand(other, 0))
+
+	__radd__ = __add__
+
+	def __sub__(self, other: Union[Sequence[Number], 'PointArray']) -> 'PointArray':
+		"""Element-wise substraction"""
+		return PointArray(self.array - self._operand(other, 0))
+
+	def __rsub__(self, other: Union[Sequence[Number], 'PointArray']) -> 'PointArray':
+		return PointArray(self._operand(other, 0) - self.array)
+
+	def __neg__(self) -> 'PointArray':
+		return PointArray(-self.array)
+
+	def __mul__(self, other: Union[Number, Sequence[Number], 'PointArray']) -> 'PointArray':
+		"""Element-wise multiplication"""
+		return PointArray(self.array * self._operand(other, 1))
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, other: Union[Number, Sequence[Number], 'PointArray']) -> 'PointArray':
+		"""Element-wise division"""
+		return PointArray(self.array / self._operand(other, 1))
+
+	def round(self) -> 'PointArray':
+		"""Returns a new array with all values rounded to integers"""
+		return PointArray(np.rint(self.array).astype(np.int64))
+
+	def bounds(self) -> Tuple[Vector, Vector]:
+		"""Returns the smallest and largest values in each axis, as two points"""
+		return Vector(self.array.min(axis=0).tolist()), Vector(self.array.max(axis=0).tolist())
+
+	def flip_x(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'PointArray':
+		"""Returns a new array with the x coordinates inverted"""
+		if not only_if:
+			return self
+		array = self.array.astype(np.float64)
+		array[:, 0] = 2 * origin[0] - array[:, 0]
+		return PointArray(array)
+
+	def flip_y(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'PointArray':
+		"""Returns a new array with the y coordinates inverted"""
+		if not only_if:
+			return self
+		array = self.array.astype(np.float64)
+		array[:, 1] = 2 * origin[1] - array[:, 1]
+		return PointArray(array)
+
+	def rotate(self, angle: float, origin: Sequence[Number] = (0, 0), deg=True) -> 'PointArray':
+		"""Rotate all points by a given angle counterclockwise in the Z axis"""
+		if deg:
+			angle = math.radians(angle)
+		cos, sin = math.cos(angle), math.sin(angle)
+		px, py = self.array[:, 0] - origin[0], self.array[:, 1] - origin[1]
+		array = self.array.astype(np.float64)
+		array[:, 0] = cos * px - sin * py + origin[0]
+		array[:, 1] = sin * px + cos * py + origin[1]
+		return PointArray(array)
+
+	def transform(self, matrix: np.ndarray) -> 'PointArray':
+		"""Returns the points mapped through a 3x3 affine matrix, or a 2x2 linear one, in a single multiplication"""
+		array = self.array[:, :2] @ matrix[:2, :2].T
+		if len(matrix) == 3:
+			array += matrix[:2, 2]
+		return PointArray(array)
+
+	def flip(self, point: Sequence[Number], angle: float, deg=True) -> 'PointArray':
+		"""Flip all points along an axis defined by a point and an angle"""
+		return self.rotate(-angle, point, deg).flip_x(point).rotate(angle, point, deg)
+
+
+class _FixedVector:
+	"""Shared behaviour of the fixed-size vectors. Subclasses store their values in slots named after _keys."""
+
+	__slots__ = ()
+	_keys: Tuple[str, ...] = ()
+
+	@classmethod
+	def from_dict(cls, d: Dict[str, Number]):
+		"""Returns a new vector from a dictionary in the format {x, y(, z)}"""
+		return cls(*(d[k] for k in cls._keys))
+
+	def __len__(self) -> int:
+		return len(self._keys)
+
+	def __getitem__(self, index: Union[int, slice]) -> Union[Number, Vector]:
+		if isinstance(index, slice):
+			return Vector(tuple(self)[index])
+		return getattr(self, self._keys[index])
+
+	def __eq__(self, other) -> bool:
+		return tuple(self) == tuple(other) if is_iterable(other) else False
+
+	def __hash__(self):
+		return hash(tuple(self))
+
+	def __repr__(self):
+		return f"{type(self).__name__}{tuple(self)}"
+
+	@property
+	def size(self):
+		"""The number of items in this vector"""
+		return len(self._keys)
+
+	def to_dict(self, base: Dict[str, Number] = None) -> Dict[str, Number]:
+		"""Returns a dictionary in the format {x, y(, z)}.
+		If a base dictionary is provided, the values are written to it instead of a new dictionary"""
+		base = base if base else {}
+		for key in self._keys:
+			base[key] = getattr(self, key)
+		return base
+
+	def flip(self, point: Sequence[Number], angle: float, deg=True):
+		"""Flip this point along an axis defined by a point and an angle"""
+		return self.rotate(-angle, point, deg).flip_x(point).rotate(angle, point, deg)
+
+	def closest_point(self, l1: Sequence[Number], l2: Sequence[Number]) -> Optional['Vec2']:
+		"""Finds the closest point in a line defined by l1 and l2"""
+		x, y = self.x, self.y
+		try:
+			s1 = (l2[1] - l1[1]) / (l2[0] - l1[0])
+			s2 = -1 / s1
+			a1 = (l1[1] - l1[0] * s1)
+			a2 = (y - x * s2)
+			cx = -(a2 - a1) / (s2 - s1)
+			return Vec2(cx, s1 * cx + a1) if l1[0] <= cx <= l2[0] or l2[0] <= cx <= l1[0] else None
+		except ZeroDivisionError:
+			if l2[0] - l1[0] == 0:  # Vertical line
+				return Vec2(l1[0], y) if l1[1] <= y <= l2[1] or l2[1] <= y <= l1[1] else None
+			else:  # Horizontal Line
+				return Vec2(x, l1[1]) if l1[0] <= x <= l2[0] or l2[0] <= x <= l1[0] else None
+
+
+class Vec2(_FixedVector):
+	"""A fast 2D vector with the same point operations as Vector.
+	Unlike Vector, the result of an operation always has 2 values, extra values of the other operand are ignored."""
+
+	__slots__ = ("x", "y")
+	_keys = ("x", "y")
+
+	def __init__(self, x: Number = 0, y: Number = 0):
+		self.x = x
+		self.y = y
+
+	@classmethod
+	def from_dict(cls, d: Dict[str, Number]) -> 'Vec2':
+		"""Returns a new vector from a dictionary in the format {x, y}"""
+		return cls(d["x"], d["y"])
+
+	def __iter__(self) -> Iterator[Number]:
+		yield self.x
+		yield self.y
+
+	def __add__(self, other: Sequence[Number]) -> 'Vec2':
+		"""Element-wise addition"""
+		if type(other) is Vec2:
+			return Vec2(self.x + other.x, self.y + other.y)
+		return Vec2(self.x + other[0], self.y + other[1])
+
+	__radd__ = __add__
+
+	def __sub__(self, other: Sequence[Number]) -> 'Vec2':
+		"""Element-wise substraction"""
+		if type(other) is Vec2:
+			return Vec2(self.x - other.x, self.y - other.y)
+		return Vec2(self.x - other[0], self.y - other[1])
+
+	def __rsub__(self, other: Sequence[Number]) -> 'Vec2':
+		return Vec2(other[0] - self.x, other[1] - self.y)
+
+	def __neg__(self) -> 'Vec2':
+		return Vec2(-self.x, -self.y)
+
+	def __mul__(self, other: Union[Number, Sequence[Number]]) -> 'Vec2':
+		"""Element-wise multiplication"""
+		if isinstance(other, SCALAR_TYPES):
+			return Vec2(self.x * other, self.y * other)
+		return Vec2(self.x * other[0], self.y * other[1])
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, other: Union[Number, Sequence[Number]]) -> 'Vec2':
+		"""Element-wise division"""
+		if isinstance(other, SCALAR_TYPES):
+			return Vec2(self.x / other, self.y / other)
+		return Vec2(self.x / other[0], self.y / other[1])
+
+	def round(self) -> 'Vec2':
+		"""Returns a new vector with all values rounded to integers"""
+		return Vec2(round(self.x), round(self.y))
+
+	def flip_x(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'Vec2':
+		"""Returns a new vector with the x coordinate inverted"""
+		return Vec2(2 * origin[0] - self.x, self.y) if only_if else self
+
+	def flip_y(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'Vec2':
+		"""Returns a new vector with the y coordinate inverted"""
+		return Vec2(self.x, 2 * origin[1] - self.y) if only_if else self
+
+	def rotate(self, angle: float, origin: Sequence[Number] = (0, 0), deg=True) -> 'Vec2':
+		"""Rotate this point by a given angle counterclockwise in the Z axis"""
+		if deg:
+			angle = math.radians(angle)
+		cos, sin = math.cos(angle), math.sin(angle)
+		ox, oy = origin[0], origin[1]
+		px, py = self.x - ox, self.y - oy
+		return Vec2(cos * px - sin * py + ox, sin * px + cos * py + oy)
+
+
+class Vec3(_FixedVector):
+	"""A fast 3D vector with the same point operations as Vector.
+	Unlike Vector, the result of an operation always has 3 values. Missing values of the other operand
+	are treated like Vector treats them: 0 when adding or substracting, 1 when multiplying or dividing."""
+
+	__slots__ = ("x", "y", "z")
+	_keys = ("x", "y", "z")
+
+	def __init__(self, x: Number = 0, y: Number = 0, z: Number = 0):
+		self.x = x
+		self.y = y
+		self.z = z
+
+	@classmethod
+	def from_dict(cls, d: Dict[str, Number]) -> 'Vec3':
+		"""Returns a new vector from a dictionary in the format {x, y(, z)}"""
+		return cls(d["x"], d["y"], d.get("z", 0))
+
+	def __iter__(self) -> Iterator[Number]:
+		yield self.x
+		yield self.y
+		yield self.z
+
+	def __add__(self, other: Sequence[Number]) -> 'Vec3':
+		"""Element-wise addition"""
+		if type(other) is Vec3:
+			return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
+		return Vec3(self.x + other[0], self.y + other[1], self.z + (other[2] if len(other) > 2 else 0))
+
+	__radd__ = __add__
+
+	def __sub__(self, other: Sequence[Number]) -> 'Vec3':
+		"""Element-wise substraction"""
+		if type(other) is Vec3:
+			return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
+		return Vec3(self.x - other[0], self.y - other[1], self.z - (other[2] if len(other) > 2 else 0))
+
+	def __rsub__(self, other: Sequence[Number]) -> 'Vec3':
+		return Vec3(other[0] - self.x, other[1] - self.y, (other[2] if len(other) > 2 else 0) - self.z)
+
+	def __neg__(self) -> 'Vec3':
+		return Vec3(-self.x, -self.y, -self.z)
+
+	def __mul__(self, other: Union[Number, Sequence[Number]]) -> 'Vec3':
+		"""Element-wise multiplication"""
+		if isinstance(other, SCALAR_TYPES):
+			return Vec3(self.x * other, self.y * other, self.z * other)
+		return Vec3(self.x * other[0], self.y * other[1], self.z * (other[2] if len(other) > 2 else 1))
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, other: Union[Number, Sequence[Number]]) -> 'Vec3':
+		"""Element-wise division"""
+		if isinstance(other, SCALAR_TYPES):
+			return Vec3(self.x / other, self.y / other, self.z / other)
+		return Vec3(self.x / other[0], self.y / other[1], self.z / (other[2] if len(other) > 2 else 1))
+
+	@property
+	def xy(self) -> Vec2:
+		"""A 2D vector with only the x and y values"""
+		return Vec2(self.x, self.y)
+
+	def round(self) -> 'Vec3':
+		"""Returns a new vector with all values rounded to integers"""
+		return Vec3(round(self.x), round(self.y), round(self.z))
+
+	def flip_x(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'Vec3':
+		"""Returns a new vector with the x coordinate inverted"""
+		return Vec3(2 * origin[0] - self.x, self.y, self.z) if only_if else self
+
+	def flip_y(self, origin: Sequence[Number] = (0, 0), only_if=True) -> 'Vec3':
+		"""Returns a new vector with the y coordinate inverted"""
+		return Vec3(self.x, 2 * origin[1] - self.y, self.z) if only_if else self
+
+	def rotate(self, angle: float, origin: Sequence[Number] = (0, 0), deg=True) -> 'Vec3':
+		"""Rotate this point by a given angle counterclockwise in the Z axis"""
+		if deg:
+			angle = math.radians(angle)
+		cos, sin = math.cos(angle), math.sin(angle)
+		ox, oy = origin[0], origin[1]
+		px, py = self.x - ox, self.y - oy
+		return Vec3(cos * px - sin * py + ox, sin * px + cos * py + oy, self.z)
+
+	def quaternion(self, deg=True) -> Vector:
+		"""Returns a new quaternion (x, y, z, w) from these euler angles (x, y, z)"""
+		return Vector(self).quaternion(deg)
@@ -14,6 +14,9 @@ BACKGROUND_COLOR = "#2A4567"
 ERROR_BACKGROUND_COLOR = "#9F2A2A"
 
 PAD = (5, 5)
+PREVIEW_SIZE = (240, 120)
+PREVIEW_POLL_MS = 100  # how often the selection window checks whether a preview is ready
+BLANK_IMAGE = b"R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"  # a transparent pixel as a base64 GIF
 
 FRAME_OPTIONS = {
 	"relief": sg.RELIEF_SOLID,
@@ -93,13 +96,21 @@ def ok_cancel(*msg: Any, read=True) -> Union[str, sg.Window]:
 	return answer
 
 
-def selection(title: str, msg: Any, items: List[str]) -> Optional[str]:
-	"""Opens a window where the user can select an item from a list, then closes and returns the selection"""
+def selection(title: str, msg: Any, items: List[Any], preview: Callable[[Any], Optional[str]] = None
+              ) -> Optional[Any]:
+	"""Opens a window where the user can select an item from a list, then closes and returns the selection.
+	Items are shown as strings. If a preview function is given, it's asked for the image file of the selected item,
+	which is shown next to the list as soon as it's ready, without waiting for it."""
 	listbox = sg.Listbox(values=items, size=(60, 10), pad=(0, 5), bind_return_key=True, default_values=[items[0]])
-	layout = [[sg.Text(msg)], [listbox], [sg.Ok(size=(5, 1))]]
+	if preview is None:
+		layout = [[sg.Text(msg)], [listbox], [sg.Ok(size=(5, 1))]]
+	else:
+		image = sg.Image(size=PREVIEW_SIZE, pad=((10, 0), 5), background_color=BACKGROUND_COLOR)
+		layout = [[sg.Text(msg)], [listbox, image], [sg.Ok(size=(5, 1))]]
 	window = sg.Window(title, layout, element_justification='left', return_keyboard_events=True)
+	shown_image = None
 	while True:
-		event, content = window.read()
+		event, content = window.read(timeout=None if preview is None else PREVIEW_POLL_MS)
 		if event == sg.WIN_CLOSED or event == "Escape:27":
 			safe_close(window)
 			return None
@@ -112,6 +123,15 @@ def selection(title: str, msg: Any, items: List[str]) -> Optional[str]:
 		elif event == "Down:40" or event == "Right:39":
 			index = items.index(content[0][0]) + 1
 			listbox.set_value([items[index % len(items)]])
+		if preview is not None:
+			selected = listbox.get()
+			image_file = preview(selected[0]) if selected else None
+			if image_file != shown_image:
+				if image_file:
+					image.update(filename=image_file, size=PREVIEW_SIZE)
+				else:
+					image.update(data=BLANK_IMAGE, size=PREVIEW_SIZE)
+				shown_image = image_file
 
 
 def open_menu() -> sg.Window:
@@ -119,7 +139,7 @@ def open_menu() -> sg.Window:
 	controls = "Escape: Menu\nMouse Wheel: Zoom\nLeft Click: Move or pan\nRight Click: Make selection\n" \
 	           "Shift+Click: Multi-select\nE: Edit shape attributes\nP: Point editing mode" \
 	           "\n └> Shift+Click: Add, Right Click: Delete\n" \
-	           "C: Clone selected\nD: Delete selected\nS: Save changes"
+	           "C: Clone selected\nD: Delete selected\nCtrl+Z: Undo, Ctrl+Y: Redo\nS: Save changes"
 	frame = sg.Frame(
 		"",
 		[[sg.Button(ev.MENU_RETURN, size=(28, 1), pad=((15, 15), (15, 3)))],
@@ -0,0 +1,73 @@
+import threading
+from subprocess import CompletedProcess
+from typing import *
+
+import editor_events as ev
+from layout_io import write_layout
+
+
+class SaveWorker:
+	"""Saves snapshots of a layout in a background thread, so that the editor keeps running while the layout is
+	written and converted. If more saves are requested while it's busy, only the latest snapshot is saved next.
+	It reports through its events: SAVE_PROGRESS with a stage of "writing" or "converting", then SAVE_DONE with
+	the converter's program, or with an error if the file couldn't be written."""
+
+	def __init__(self, jsonfile: str, convert: Callable[[str], CompletedProcess]):
+		"""The convert function runs the converter on a .layout.json file and returns the finished program"""
+		self.jsonfile = jsonfile
+		self._convert = convert
+		self._pending: Optional[dict] = None
+		self._busy = False
+		self._closed = False
+		self._condition = threading.Condition()
+		worker_events = ev.EventCommunicator()
+		self._events = worker_events
+		self.events = worker_events.flipped()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def save(self, snapshot: dict):
+		"""Queues a snapshot of the layout to be saved, replacing any other that was still waiting.
+		The snapshot must not be changed afterwards."""
+		with self._condition:
+			self._pending = snapshot
+			self._condition.notify()
+
+	@property
+	def busy(self) -> bool:
+		"""Whether a save is waiting or in progress"""
+		with self._condition:
+			return self._busy or self._pending is not None
+
+	def close(self, wait=True):
+		"""Stops the worker once the saves that were requested are done"""
+		with self._condition:
+			self._closed = True
+			self._condition.notify()
+		if wait:
+			self._thread.join()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while self._pending is None and not self._closed:
+					self._condition.wait()
+				if self._pending is None:
+					return
+				snapshot, self._pending = self._pending, None
+				self._busy = True
+			try:
+				self._events.send(ev.SAVE_PROGRESS, stage="writing")
+				write_layout(snapshot, self.jsonfile)
+				with self._condition:
+					superseded = self._pending is not None
+				if superseded:  # a newer snapshot will be written over it, so there's no point converting this one
+					continue
+				self._events.send(ev.SAVE_PROGRESS, stage="converting")
+				program = self._convert(self.jsonfile)
+				self._events.send(ev.SAVE_DONE, program=program, error=None)
+			except Exception as error:
+				self._events.send(ev.SAVE_DONE, program=None, error=error)
+			finally:
+				with self._condition:
+					self._busy = False
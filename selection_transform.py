@@ -0,0 +1,113 @@
+"""Moving, rotating and scaling many selected objects at once, such as during a drag"""
+import math
+import numpy as np
+from typing import *
+
+import layout_objects as lay
+from math_objects import Vector
+
+SHAPE_KEYS = ("m_Pos", "m_Rot", "m_RotationDegrees", "m_Scale", "m_StaticPins")
+POSITION_KEYS = ("m_Pos",)
+
+
+class SelectionTransform:
+	"""Applies translations, rotations and uniform scales to a group of objects as a whole. The positions of the
+	objects, and of the static pins and dynamic anchors of the custom shapes among them, are kept in one array
+	that every operation transforms at once. They're written back to the layout when flush() is called, such as once
+	per frame, and change listeners are told about a single change per object when finish() is called."""
+
+	def __init__(self, objects: Iterable[lay.LayoutObject]):
+		self.objects = list(objects)
+		self.shapes = [obj for obj in self.objects if isinstance(obj, lay.CustomShape)]
+		ids = {id(obj) for obj in self.objects}
+		self.anchors = [anchor for anchor in dict.fromkeys(a for shape in self.shapes for a in shape.anchors)
+		                if id(anchor) not in ids]
+		self.pins = [pin for shape in self.shapes for pin in shape.static_pins]
+		points = [(d["x"], d["y"]) for d in chain_positions(self.objects, self.anchors)]
+		points.extend((pin["x"], pin["y"]) for pin in self.pins)
+		self._origins = np.array(points, dtype=np.float64).reshape(-1, 2)
+		self._rotations: Optional[List[Vector]] = None  # of the shapes, read when they're first rotated or scaled
+		self._scales: Optional[List[Vector]] = None
+		self._matrix = np.identity(3)  # from the original positions to the current ones
+		self._degrees = 0.0
+		self._factor = 1.0
+		self._dirty = False
+		self._shapes_dirty = False
+		self._old_values = [obj._snapshot(self._keys(obj)) for obj in self.objects + self.anchors]
+
+	@staticmethod
+	def _keys(obj: lay.LayoutObject) -> Sequence[str]:
+		return SHAPE_KEYS if isinstance(obj, lay.CustomShape) else POSITION_KEYS
+
+	def _apply(self, matrix: np.ndarray):
+		self._matrix = matrix @ self._matrix
+		self._dirty = True
+
+	def translate(self, offset: Sequence[float]):
+		if not (offset[0] or offset[1]):
+			return
+		matrix = np.identity(3)
+		matrix[:2, 2] = offset[0], offset[1]
+		self._apply(matrix)
+
+	def rotate(self, degrees: float, center: Sequence[float]):
+		"""Rotates the objects counterclockwise around a point in world space"""
+		angle = math.radians(degrees)
+		cos, sin = math.cos(angle), math.sin(angle)
+		cx, cy = center[0], center[1]
+		self._apply(np.array([[cos, -sin, cx - cos * cx + sin * cy],
+		                      [sin, cos, cy - sin * cx - cos * cy],
+		                      [0, 0, 1]]))
+		self._degrees += degrees
+		self._shapes_changed()
+
+	def scale(self, factor: float, center: Sequence[float]):
+		"""Scales the objects, and the distances between them, by the same factor around a point in world space"""
+		cx, cy = center[0], center[1]
+		self._apply(np.array([[factor, 0, cx - factor * cx],
+		                      [0, factor, cy - factor * cy],
+		                      [0, 0, 1]]))
+		self._factor *= factor
+		self._shapes_changed()
+
+	def _shapes_changed(self):
+		if self._rotations is None:
+			self._rotations = [Vector(*shape.rotations[:2], shape.rotation) for shape in self.shapes]
+			self._scales = [shape.scale for shape in self.shapes]
+		self._shapes_dirty = True
+
+	def flush(self):
+		"""Writes the transformed positions, rotations and scales to the layout, and lets observers know"""
+		if not self._dirty:
+			return
+		self._dirty = False
+		positions = (self._origins @ self._matrix[:2, :2].T + self._matrix[:2, 2]).tolist()
+		for d, (x, y) in zip(chain_positions(self.objects, self.anchors), positions):
+			d["x"], d["y"] = x, y
+		for pin, (x, y) in zip(self.pins, positions[len(self.objects) + len(self.anchors):]):
+			pin["x"], pin["y"] = x, y
+		if self._shapes_dirty:
+			self._shapes_dirty = False
+			for shape, rotations, scale in zip(self.shapes, self._rotations, self._scales):
+				rotations = Vector(rotations.x, rotations.y, rotations.z + self._degrees)
+				rotations.quaternion().to_dict(shape.dictionary["m_Rot"])
+				shape.dictionary["m_RotationDegrees"] = rotations.z
+				Vector(scale.x * self._factor, scale.y * self._factor, scale.z).to_dict(shape.dictionary["m_Scale"])
+				shape._shape_version += 1
+		for obj in self.objects:
+			obj._changed()
+		for anchor in self.anchors:
+			anchor._changed()
+
+	def finish(self):
+		"""Writes what's left to the layout, and tells change listeners how each object changed since the start"""
+		self.flush()
+		for obj, old_values in zip(self.objects + self.anchors, self._old_values):
+			obj._report(self._keys(obj), old_values)
+
+
+def chain_positions(*object_lists: Sequence[lay.LayoutObject]) -> Iterator[dict]:
+	"""The position dictionaries of objects"""
+	for objects in object_lists:
+		for obj in objects:
+			yield obj.dictionary["m_Pos"]
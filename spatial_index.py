@@ -0,0 +1,128 @@
+import math
+import numpy as np
+from itertools import count
+from typing import *
+
+Number = Union[int, float]
+Bounds = Tuple[float, float, float, float]  # min x, min y, max x, max y in world space
+CellRange = Tuple[int, int, int, int]
+
+CELL_SIZE = 4.0
+MAX_CELLS_PER_OBJECT = 1024
+
+
+class Bounded(Protocol):
+	world_bounds: Bounds
+
+
+BoundedT = TypeVar("BoundedT", bound=Bounded)
+
+
+def overlaps(a: Bounds, b: Bounds) -> bool:
+	"""Whether two world space rectangles touch or intersect"""
+	return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def overlaps_many(bounds: np.ndarray, other: Bounds) -> np.ndarray:
+	"""Whether each row of an (N, 4) array of bounds touches or intersects a rectangle, as an array of booleans"""
+	return ((bounds[:, 0] <= other[2]) & (other[0] <= bounds[:, 2])
+	        & (bounds[:, 1] <= other[3]) & (other[1] <= bounds[:, 3]))
+
+
+class SpatialGrid(Generic[BoundedT]):
+	"""A uniform grid over world space that finds which objects may be under a point or inside a rectangle,
+	without checking every object. Each object is stored in every cell its world_bounds touch.
+	Queries return the objects in the order they were inserted, so that the last one is the one drawn on top."""
+
+	def __init__(self, objects: Iterable[BoundedT] = (), cell_size: float = CELL_SIZE):
+		self.cell_size = cell_size
+		self._cells: Dict[Tuple[int, int], Set[BoundedT]] = {}
+		self._ranges: Dict[BoundedT, Optional[CellRange]] = {}
+		self._order: Dict[BoundedT, int] = {}
+		self._large: Set[BoundedT] = set()  # objects covering too many cells are checked on every query instead
+		self._counter = count()
+		for obj in objects:
+			self.insert(obj)
+
+	def _cell_range(self, bounds: Bounds) -> Optional[CellRange]:
+		"""The first and last cells touched by the bounds, or None if there are too many of them"""
+		x0, y0 = math.floor(bounds[0] / self.cell_size), math.floor(bounds[1] / self.cell_size)
+		x1, y1 = math.floor(bounds[2] / self.cell_size), math.floor(bounds[3] / self.cell_size)
+		if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_OBJECT:
+			return None
+		return x0, y0, x1, y1
+
+	def _add(self, obj: BoundedT, cells: Optional[CellRange]):
+		self._ranges[obj] = cells
+		if cells is None:
+			self._large.add(obj)
+			return
+		for x in range(cells[0], cells[2] + 1):
+			for y in range(cells[1], cells[3] + 1):
+				self._cells.setdefault((x, y), set()).add(obj)
+
+	def _discard(self, obj: BoundedT, cells: Optional[CellRange]):
+		if cells is None:
+			self._large.discard(obj)
+			return
+		for x in range(cells[0], cells[2] + 1):
+			for y in range(cells[1], cells[3] + 1):
+				cell = self._cells[(x, y)]
+				cell.discard(obj)
+				if not cell:
+					del self._cells[(x, y)]
+
+	def insert(self, obj: BoundedT):
+		"""Adds an object to the grid, or updates it if it was already added"""
+		if obj in self._ranges:
+			self.update(obj)
+			return
+		self._order[obj] = next(self._counter)
+		self._add(obj, self._cell_range(obj.world_bounds))
+
+	def update(self, obj: BoundedT, *args):
+		"""Moves an object to the cells of its current bounds. Objects that aren't in the grid are ignored.
+		Extra arguments are ignored so that this can be used directly as an observer callback."""
+		if (old_cells := self._ranges.get(obj, False)) is False:
+			return
+		new_cells = self._cell_range(obj.world_bounds)
+		if new_cells != old_cells:
+			self._discard(obj, old_cells)
+			self._add(obj, new_cells)
+
+	def remove(self, obj: BoundedT):
+		"""Removes an object from the grid if it's in it"""
+		if (cells := self._ranges.pop(obj, False)) is False:
+			return
+		self._discard(obj, cells)
+		del self._order[obj]
+
+	def clear(self):
+		self._cells.clear()
+		self._ranges.clear()
+		self._order.clear()
+		self._large.clear()
+
+	def query_rect(self, bounds: Bounds) -> List[BoundedT]:
+		"""Returns the objects whose bounds overlap the given world space rectangle, in insertion order"""
+		found = set(obj for obj in self._large if overlaps(obj.world_bounds, bounds))
+		cells = self._cell_range(bounds)
+		if cells is None:  # huge query, it's cheaper to check every object
+			found.update(obj for obj in self._ranges if overlaps(obj.world_bounds, bounds))
+		else:
+			for x in range(cells[0], cells[2] + 1):
+				for y in range(cells[1], cells[3] + 1):
+					for obj in self._cells.get((x, y), ()):
+						if obj not in found and overlaps(obj.world_bounds, bounds):
+							found.add(obj)
+		return sorted(found, key=self._order.__getitem__)
+
+	def query_point(self, point: Sequence[Number], radius: float = 0) -> List[BoundedT]:
+		"""Returns the objects whose bounds are within a radius of the given world space point, in insertion order"""
+		return self.query_rect((point[0] - radius, point[1] - radius, point[0] + radius, point[1] + radius))
+
+	def __len__(self) -> int:
+		return len(self._ranges)
+
+	def __contains__(self, obj) -> bool:
+		return obj in self._ranges
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from pygame import Surface
+from typing import *
+
+SPRITE_CACHE_BUDGET = 64 * 1024 * 1024  # bytes
+
+
+class SpriteCache:
+	"""Keeps one pre-rendered surface per owner, along with the key it was rendered for, such as the owner's
+	version and the zoom level. When the surfaces take more memory than the budget, the least recently used
+	ones are dropped."""
+
+	def __init__(self, budget: int = SPRITE_CACHE_BUDGET):
+		self.budget = budget
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self._entries: OrderedDict[Any, Tuple[Hashable, Surface, Tuple[int, int], int]] = OrderedDict()
+
+	@staticmethod
+	def _surface_size(surface: Surface) -> int:
+		return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+	def fits(self, width: int, height: int, bytes_per_pixel=4) -> bool:
+		"""Whether a surface of the given size is small enough to be cached"""
+		return width * height * bytes_per_pixel <= self.budget // 4
+
+	def get(self, owner, key: Hashable) -> Optional[Tuple[Surface, Tuple[int, int]]]:
+		"""Returns the surface and its offset stored for an owner, or None if there isn't one for the given key"""
+		entry = self._entries.get(owner)
+		if entry is None or entry[0] != key:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self._entries.move_to_end(owner)
+		return entry[1], entry[2]
+
+	def put(self, owner, key: Hashable, surface: Surface, offset: Tuple[int, int]):
+		"""Stores the surface for an owner, replacing the previous one"""
+		self.discard(owner)
+		size = self._surface_size(surface)
+		self._entries[owner] = (key, surface, offset, size)
+		self.size += size
+		while self.size > self.budget and len(self._entries) > 1:
+			_, (_, _, _, old_size) = self._entries.popitem(last=False)
+			self.size -= old_size
+
+	def discard(self, owner):
+		"""Drops the surface stored for an owner, if any"""
+		entry = self._entries.pop(owner, None)
+		if entry is not None:
+			self.size -= entry[3]
+
+	def clear(self):
+		self._entries.clear()
+		self.size = 0
+
+	def info(self) -> Tuple[int, int, int, int]:
+		"""Returns the hits, misses, number of surfaces and bytes used"""
+		return self.hits, self.misses, len(self._entries), self.size
+
+	def __len__(self) -> int:
+		return len(self._entries)
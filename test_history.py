@@ -0,0 +1,75 @@
+import layout_objects as lay
+from history import History
+
+
+def make_pillars(count: int) -> lay.LayoutList:
+	layout = {"m_Pillars": [{"m_Pos": {"x": i, "y": 0, "z": 0}, "m_Height": 1.0, "m_PrefabName": "Pillar"}
+	                        for i in range(count)]}
+	return lay.LayoutList(lay.Pillar, layout)
+
+
+def assert_index_matches(pillars: lay.LayoutList):
+	for i, pillar in enumerate(pillars):
+		assert pillars.index(pillar) == i
+	assert [p.dictionary for p in pillars] == pillars._dictlist
+
+
+def test_undo_add_and_remove_keeps_the_index():
+	pillars = make_pillars(5)
+	history = History(lambda obj: None, lambda obj: None)
+	history.watch_list(pillars)
+	assert_index_matches(pillars)
+
+	removed = pillars[1]
+	pillars.remove(removed)
+	history.commit()
+	assert removed not in pillars
+	assert_index_matches(pillars)
+
+	added = lay.Pillar({"m_Pos": {"x": 9, "y": 0, "z": 0}, "m_Height": 1.0, "m_PrefabName": "Pillar"})
+	pillars.insert(0, added)
+	history.commit()
+	assert_index_matches(pillars)
+
+	assert history.undo()
+	assert added not in pillars
+	assert_index_matches(pillars)
+	assert history.undo()
+	assert pillars[1] is removed
+	assert_index_matches(pillars)
+	assert pillars._positions is not None  # updated in place rather than dropped
+
+	assert history.redo()
+	assert removed not in pillars
+	assert_index_matches(pillars)
+	assert history.redo()
+	assert pillars[0] is added
+	assert_index_matches(pillars)
+
+
+def test_undo_move_of_shape_moves_pins_back():
+	shape = lay.CustomShape({
+		"m_Pos": {"x": 0.0, "y": 0.0, "z": 0.0}, "m_Rot": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0},
+		"m_Scale": {"x": 1.0, "y": 1.0, "z": 1.0}, "m_Flipped": False, "m_RotationDegrees": 0.0,
+		"m_Color": {"r": 1.0, "g": 1.0, "b": 1.0, "a": 1.0}, "m_DynamicAnchorGuids": [],
+		"m_PointsLocalSpace": [{"x": -1.0, "y": -1.0}, {"x": 1.0, "y": -1.0}, {"x": 0.0, "y": 1.0}],
+		"m_StaticPins": [{"x": 0.5, "y": 0.0, "z": 0.0}],
+	})
+	changes = []
+	history = History(lambda obj: None, lambda obj: None)
+	history.watch(shape)
+	shape.add_change_listener(lambda obj, key, old, new: changes.append(key))
+
+	history.begin_group()
+	for x in range(1, 4):
+		shape.pos = lay.Vector(x, 2, 0)
+	history.end_group()
+	assert set(changes) == {lay.CustomShape.MOVE_KEY}  # the pins aren't copied
+	assert shape.static_pins == [{"x": 3.5, "y": 2.0, "z": 0.0}]
+
+	assert history.undo()
+	assert shape.pos == lay.Vector(0, 0, 0)
+	assert shape.static_pins == [{"x": 0.5, "y": 0.0, "z": 0.0}]
+	assert history.redo()
+	assert shape.pos == lay.Vector(3, 2, 0)
+	assert shape.static_pins == [{"x": 3.5, "y": 2.0, "z": 0.0}]
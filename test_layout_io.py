@@ -0,0 +1,107 @@
+import re
+import json
+import math
+import random
+
+import pytest
+
+import layout_io
+from layout_io import dumps_layout, parse_layout, write_layout, snapshot_layout
+
+
+def dumps_with_regex(layout: dict) -> str:
+	"""How layouts used to be saved: indented by json.dumps, then joined back into one line per object"""
+	jsonstr = json.dumps(layout, indent=2)
+	jsonstr = re.sub(r"(\r\n|\r|\n)( ){6,}", r" ", jsonstr)
+	return re.sub(r"(\r\n|\r|\n)( ){4,}([}\]])", r" \3", jsonstr)
+
+
+def random_value(rng: random.Random, depth: int):
+	kind = rng.randrange(9 if depth < 5 else 7)
+	if kind == 0:
+		return rng.choice([None, True, False])
+	if kind == 1:
+		return rng.randint(-10 ** 30, 10 ** 30)
+	if kind == 2:
+		return rng.uniform(-1e6, 1e6)
+	if kind == 3:
+		return rng.choice([float("nan"), float("inf"), -float("inf"), 0.0, -0.0, 1e-300])
+	if kind in (4, 5, 6):
+		return "".join(rng.choice('ab "\\\n\té€😀') for _ in range(rng.randrange(6)))
+	if kind == 7:
+		return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+	keys = [rng.choice(["m_Pos", "x", "é", 1, 2.5, True, None]) for _ in range(rng.randrange(4))]
+	return {key: random_value(rng, depth + 1) for key in keys}
+
+
+def test_round_trip_of_values_json_reads_differently():
+	layout = {"m_Values": [float("nan"), float("inf"), -float("inf"), 123456789012345678901234567890,
+	                       -9223372036854775809, 18446744073709551615, 0.1]}
+	for data in (dumps_layout(layout), dumps_layout(layout).encode()):
+		values = parse_layout(data)["m_Values"]
+		assert math.isnan(values[0])
+		assert values[1:3] == [float("inf"), -float("inf")]
+		assert values[3:] == layout["m_Values"][3:]
+		assert all(type(a) is type(b) for a, b in zip(values[3:], layout["m_Values"][3:]))
+
+
+def test_huge_exponent_is_infinity():
+	assert parse_layout(b"[1e400, -1e400]") == [float("inf"), -float("inf")]
+
+
+def test_fast_parser_falls_back_to_json(monkeypatch):
+	calls = []
+
+	def fast_loads(data):
+		calls.append(data)
+		if b"NaN" in data:
+			raise ValueError("not JSON")
+		return json.loads(data)
+
+	monkeypatch.setattr(layout_io, "_loads", fast_loads)
+	assert parse_layout(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+	assert len(calls) == 1
+	assert math.isnan(parse_layout(b'{"a": NaN}')["a"])
+	assert len(calls) == 2
+	# Numbers that may not fit in 64 bits never reach the fast parser
+	assert parse_layout(b'{"a": 12345678901234567890123}') == {"a": 12345678901234567890123}
+	assert parse_layout('{"a": 12345678901234567890123}') == {"a": 12345678901234567890123}
+	assert len(calls) == 2
+	with pytest.raises(json.JSONDecodeError) as error:
+		parse_layout(b'{\n  "a": [1,\n  NaN, }')
+	assert (error.value.lineno, error.value.colno) == (3, 8)
+
+
+def test_serializer_matches_the_old_format():
+	layout = {
+		"m_Version": 26, "m_Empty": {}, "m_EmptyList": [], "m_Text": "Pine Mountains é",
+		"m_Anchors": [{"m_Pos": {"x": 1.5, "y": -2.0, "z": 0.0}, "m_Guid": "a", "m_Tags": []}],
+		"m_Bridge": {"m_BridgeJoints": [], "m_BridgeEdges": [{"m_Material": 3, "m_Points": [[0, 1], {"a": {}}]}]},
+	}
+	assert dumps_layout(layout) == dumps_with_regex(layout)
+	rng = random.Random(0)
+	for _ in range(300):
+		value = {f"m_{i}": random_value(rng, 0) for i in range(rng.randrange(5))}
+		assert dumps_layout(value) == dumps_with_regex(value)
+
+
+def test_write_layout_in_chunks(tmp_path, monkeypatch):
+	monkeypatch.setattr(layout_io, "WRITE_CHUNK_SIZE", 16)
+	layout = {"m_List": [{"x": i, "y": [i, "é"]} for i in range(50)]}
+	path = tmp_path / "level.layout.json"
+	write_layout(layout, str(path))
+	assert path.read_text() == dumps_with_regex(layout)
+
+
+def test_snapshot_copies_containers_and_shares_values():
+	layout = {"m_Pos": {"x": 1.0}, "m_Points": [{"x": 0.0}, [1, 2]], "m_Name": "level"}
+	snapshot = snapshot_layout(layout)
+	assert snapshot == layout
+	assert snapshot["m_Pos"] is not layout["m_Pos"]
+	assert snapshot["m_Points"][0] is not layout["m_Points"][0]
+	assert snapshot["m_Points"][1] is not layout["m_Points"][1]
+	assert snapshot["m_Name"] is layout["m_Name"]
+	layout["m_Pos"]["x"] = 2.0
+	layout["m_Points"][1].append(3)
+	assert snapshot["m_Pos"]["x"] == 1.0
+	assert snapshot["m_Points"][1] == [1, 2]
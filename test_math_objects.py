@@ -0,0 +1,15 @@
+import numpy as np
+
+from math_objects import Vector, Vec2, Vec3
+
+
+def test_fixed_vectors_are_truthy_like_vector():
+	assert bool(Vec2(0, 0)) is bool(Vector(0, 0)) is True
+	assert bool(Vec3(0, 0, 0)) is bool(Vector(0, 0, 0)) is True
+
+
+def test_fixed_vectors_take_numpy_scalars():
+	assert Vec2(1, 2) * np.int64(2) == Vector(1, 2) * 2
+	assert Vec2(1, 2) / np.float64(2) == Vector(0.5, 1)
+	assert Vec3(1, 2, 3) * np.float32(2) == Vector(2, 4, 6)
+	assert Vec3(2, 4, 6) / np.int32(2) == Vector(1, 2, 3)
@@ -0,0 +1,146 @@
+"""Thumbnails of levels for the level picker, drawn by the layout objects themselves on offscreen surfaces.
+They're generated in other processes and cached as PNG files named after a hash of the level's contents,
+so a thumbnail is only drawn again when the level changes."""
+import os
+import math
+import hashlib
+import pygame
+import pygame.image
+import pygame.transform
+from pygame import Surface
+from concurrent.futures import ProcessPoolExecutor, Future
+from itertools import chain
+from typing import *
+
+import cache_files
+import layout_objects as lay
+from layout_io import parse_layout
+from level_catalog import LevelInfo
+from math_objects import Vector
+
+THUMBNAIL_SIZE = (240, 120)
+THUMBNAIL_VERSION = 1  # increase when thumbnails are drawn differently, so that cached ones are drawn again
+THUMBNAIL_FOLDER = "thumbnails"
+THUMBNAIL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+SUPERSAMPLING = 2  # levels are drawn bigger and scaled down, as most objects are not antialiased
+BACKGROUND_COLOR = (43, 70, 104)
+FOREGROUND_COLOR = (255, 255, 255)
+PADDING = 4  # pixels
+
+
+def content_hash(data: bytes) -> str:
+	"""Identifies a thumbnail by the contents of the level and the way it's drawn"""
+	digest = hashlib.sha1(data)
+	digest.update(f"{THUMBNAIL_VERSION} {THUMBNAIL_SIZE}".encode())
+	return digest.hexdigest()
+
+
+def thumbnail_path(digest: str) -> str:
+	return os.path.join(cache_files.cache_folder(), THUMBNAIL_FOLDER, f"{digest}.png")
+
+
+def render_layout(layout: dict, size: Sequence[int] = THUMBNAIL_SIZE) -> Surface:
+	"""Draws the whole level as large as it fits in a surface of the given size, the same way the editor does"""
+	layout["m_Bridge"]["m_Anchors"] = layout["m_Anchors"]
+	terrain_stretches = lay.LayoutList(lay.TerrainStretch, layout)
+	water_blocks = lay.LayoutList(lay.WaterBlock, layout)
+	platforms = lay.LayoutList(lay.Platform, layout)
+	ramps = lay.LayoutList(lay.Ramp, layout)
+	custom_shapes = lay.LayoutList(lay.CustomShape, layout)
+	pillars = lay.LayoutList(lay.Pillar, layout)
+	anchors = lay.LayoutList(lay.Anchor, layout)
+	bridge = lay.Bridge(layout)
+
+	thumbnail = Surface(size)
+	thumbnail.fill(BACKGROUND_COLOR)
+	objects = list(chain(terrain_stretches, water_blocks, platforms, ramps, custom_shapes, pillars, anchors))
+	bounds = [obj.world_bounds for obj in objects] + bridge.edge_bounds.tolist()
+	if not bounds:
+		return thumbnail
+	left, bottom = min(b[0] for b in bounds), min(b[1] for b in bounds)
+	right, top = max(b[2] for b in bounds), max(b[3] for b in bounds)
+	width, height = max(right - left, 1e-3), max(top - bottom, 1e-3)
+
+	# Drawn at a whole zoom level, then scaled down to fit
+	fit = min((size[0] - 2 * PADDING) / width, (size[1] - 2 * PADDING) / height)
+	zoom = max(1, round(fit * SUPERSAMPLING))
+	padding = PADDING * SUPERSAMPLING
+	surface = Surface((math.ceil(width * zoom) + 2 * padding, math.ceil(height * zoom) + 2 * padding))
+	surface.fill(BACKGROUND_COLOR)
+	camera = Vector(padding / zoom - left, -padding / zoom - top)
+	for terrain in terrain_stretches:
+		terrain.render(surface, camera, zoom, FOREGROUND_COLOR)
+	for water in water_blocks:
+		water.render(surface, camera, zoom, FOREGROUND_COLOR)
+	for platform in platforms:
+		platform.render(surface, camera, zoom)
+	for ramp in ramps:
+		ramp.render(surface, camera, zoom)
+	shape_args = lay.ShapeRenderArgs(False, False, False, Vector(), Vector())
+	for shape in custom_shapes:
+		shape.render(surface, camera, zoom, shape_args)
+	for pillar in pillars:
+		pillar.render(surface, camera, zoom)
+	bridge.render(surface, camera, zoom)
+	dynamic_anchor_ids = set(chain(*[shape.dynamic_anchor_ids for shape in custom_shapes]))
+	for anchor in anchors:
+		anchor.render(surface, camera, zoom, dynamic_anchor_ids)
+
+	scale = min(size[0] / surface.get_width(), size[1] / surface.get_height())
+	scaled_size = (max(1, round(surface.get_width() * scale)), max(1, round(surface.get_height() * scale)))
+	scaled = pygame.transform.smoothscale(surface, scaled_size)
+	thumbnail.blit(scaled, ((size[0] - scaled_size[0]) // 2, (size[1] - scaled_size[1]) // 2))
+	return thumbnail
+
+
+def make_thumbnail(jsonfile: str) -> Optional[str]:
+	"""Returns the path of the thumbnail of a .layout.json file, drawing it if it isn't cached.
+	Returns None if the file isn't a level that can be drawn. This runs in the worker processes."""
+	try:
+		with open(jsonfile, "rb") as openfile:
+			data = openfile.read()
+		path = thumbnail_path(content_hash(data))
+		if os.path.isfile(path):
+			return path
+		surface = render_layout(parse_layout(data))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		temp_path = f"{path}.{os.getpid()}.tmp.png"
+		pygame.image.save(surface, temp_path)
+		os.replace(temp_path, path)
+		return path
+	except Exception:
+		return None
+
+
+class ThumbnailGenerator:
+	"""Makes the thumbnails of many levels on a pool of processes, most recently modified first.
+	They're picked up with get() as they finish, which never waits. Stale levels are left out, as their
+	.layout.json is old: they're added with add() once they've been converted."""
+
+	def __init__(self, levels: Iterable[LevelInfo], workers: int = THUMBNAIL_WORKERS):
+		levels = sorted((info for info in levels if info.json_stat is not None and not info.stale),
+		                key=lambda info: info.json_stat[1], reverse=True)
+		self._executor = ProcessPoolExecutor(max_workers=workers)
+		self._futures: Dict[str, Future] = {info.name: self._executor.submit(make_thumbnail, os.path.abspath(info.jsonfile))
+		                                    for info in levels}
+
+	def add(self, info: LevelInfo):
+		"""Makes the thumbnail of a level, replacing any it had. Can be called from other threads,
+		and does nothing once the generator was cancelled."""
+		try:
+			self._futures[info.name] = self._executor.submit(make_thumbnail, os.path.abspath(info.jsonfile))
+		except RuntimeError:  # the pool was shut down
+			pass
+
+	def get(self, name: str) -> Optional[str]:
+		"""The path of a level's thumbnail, or None if it's not ready or couldn't be made"""
+		future = self._futures.get(name)
+		if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+			return None
+		return future.result()
+
+	def cancel(self):
+		"""Stops making thumbnails, letting the ones being drawn finish in the background"""
+		for future in list(self._futures.values()):
+			future.cancel()
+		self._executor.shutdown(wait=False)